@@ -12,8 +12,14 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 
+from artifacts import find_artifact, read_artifact
 from config import COLORS, PLOTLY_TEMPLATE
 from translations import TEXTS
+from monte_carlo import (
+    BANDS_FILE, FINALS_FILE, MC_VOLATILITY, PATHS_FILE, SUMMARY_FILE, IncrementalMonteCarlo,
+    latest_npy, load_bands, load_summary, open_finals, open_paths, summarize_finals, summary_metrics,
+)
+from risk import portfolio_frontier
 
 st.set_page_config(
     page_title="Financial & HR Intelligence",
@@ -378,15 +384,76 @@ render_language_selector()
 def load_data():
     out = {}
     try:
-        out["prices"]   = pd.read_csv("output/financial_clean.csv", index_col=0, parse_dates=True)
-        out["arima"]    = pd.read_csv("output/arima_forecast.csv", parse_dates=["date"])
-        out["mc"]       = pd.read_csv("output/monte_carlo_results.csv")
-        out["hr"]       = pd.read_csv("output/hr_clean.csv")
+        # Artefactos columnares tipados; CSV si no existen (outputs previos)
+        out["prices"]   = read_artifact("financial_clean", index_col=0, parse_dates=True)
+        out["arima"]    = read_artifact("arima_forecast", parse_dates=["date"])
+        out["hr"]       = read_artifact("hr_clean")
         return out
     except Exception as e:
         st.error(f"Error cargando datos: {e}. Ejecuta los pipelines primero.")
         return {}
 
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_mc_paths(path, mtime):
+    """
+    Trayectorias Monte Carlo mapeadas en memoria: una sola copia para todas
+    las sesiones. Clave ruta + mtime: una corrida nueva descarta el mapeo anterior.
+    """
+    try:
+        return open_paths(path)
+    except Exception:
+        return None
+
+def file_mtime(path: str):
+    """mtime del archivo (None si no existe): clave de caché para recargar tras cada pipeline."""
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_mc_summary(mtime):
+    """Resumen del pipeline (histograma, grilla de cuantiles, medias de cola): tamaño fijo."""
+    try:
+        return load_summary()
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_mc_finals(path, mtime):
+    """
+    Finales ordenados del pipeline mapeados en memoria: el page cache los
+    comparte entre sesiones. Con max_entries=1 una corrida nueva (otra
+    ruta/mtime) descarta el mapeo anterior.
+    """
+    try:
+        return open_finals(path)
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_mc_results_finals(path, mtime):
+    """Fallback sin monte_carlo_finals.npy: finales ordenados desde monte_carlo_results (clave ruta + mtime)."""
+    try:
+        return np.sort(read_artifact("monte_carlo_results", columns=["final_value"])["final_value"].to_numpy())
+    except Exception:
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_mc_bands(mtime):
+    """Bandas de cuantiles por mes del fan chart (matriz 5 × 13, valores acumulados); clave mtime."""
+    try:
+        return load_bands()[1]
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def get_mc_engine(prices: pd.DataFrame):
+    """Motor Monte Carlo incremental compartido (covarianza del pipeline): conserva las simulaciones previas."""
+    return IncrementalMonteCarlo.from_prices(prices)
+
+@st.cache_data(show_spinner=False)
+def load_frontier(prices: pd.DataFrame, risk_measure: str):
+    """Barrido de 2,000 portfolios sobre escenarios comunes (una sola simulación, covarianza del pipeline)."""
+    return portfolio_frontier(prices, n_portfolios=2000, risk_measure=risk_measure)
+
 data = load_data()
 if not data:
     st.warning("⚠️ Datos no encontrados. Por favor verifica que la carpeta 'output/' contenga los archivos CSV necesarios.")
@@ -394,7 +461,6 @@ if not data:
 
 prices = data["prices"]
 arima_df = data["arima"]
-mc_df = data["mc"]
 hr_df = data["hr"]
 
 # ─── Sidebar — nav uses session state to avoid desync ─────────
@@ -420,7 +486,43 @@ st.session_state.nav_page = nav
 
 st.sidebar.markdown("---")
 
-n_sims = st.sidebar.slider(t("filter_sims"), 1000, 10000, 5000, 500)
+# Distribución Monte Carlo como resumen de tamaño fijo. En la posición del
+# slider de la corrida del pipeline se usa su resumen (o sus finales mapeados en
+# memoria); con otro valor, Monte Carlo bajo demanda (subir el slider sólo
+# simula lo que falta, bajarlo corta las simulaciones existentes)
+pipeline_summary = load_mc_summary(file_mtime(SUMMARY_FILE))
+pipeline_finals_path = latest_npy(FINALS_FILE)
+pipeline_finals = (
+    load_mc_finals(pipeline_finals_path, file_mtime(pipeline_finals_path))
+    if pipeline_summary is None and pipeline_finals_path else None
+)
+pipeline_sims = (pipeline_summary["n_simulations"] if pipeline_summary
+                 else len(pipeline_finals) if pipeline_finals is not None else None)
+# Rango fijo del slider: corridas mayores que MC_SLIDER_MAX sólo llegan como
+# artefactos del pipeline/worker, en la posición más cercana del slider
+MC_SLIDER_MIN, MC_SLIDER_MAX, MC_SLIDER_STEP = 1000, 50_000, 500
+pipeline_pos = (None if pipeline_sims is None else
+                min(max(round(pipeline_sims / MC_SLIDER_STEP) * MC_SLIDER_STEP, MC_SLIDER_MIN), MC_SLIDER_MAX))
+n_sims = st.sidebar.slider(
+    t("filter_sims"), MC_SLIDER_MIN, MC_SLIDER_MAX, pipeline_pos or 5000, MC_SLIDER_STEP,
+    help=t("mc_mapped_help").format(pos=pipeline_pos, n=pipeline_sims) if pipeline_sims is not None else None,
+)
+mc_summary, mc_finals = None, None
+if n_sims == pipeline_pos:
+    mc_summary, mc_finals = pipeline_summary, pipeline_finals
+elif not prices.empty:
+    try:
+        mc_finals = np.sort(get_mc_engine(prices).finals(n_sims))
+    except Exception as e:
+        st.sidebar.warning(t("mc_engine_error").format(n=n_sims, err=e))
+if mc_summary is None and mc_finals is None:
+    mc_summary, mc_finals = pipeline_summary, pipeline_finals
+if mc_summary is None and mc_finals is None:
+    results_path = find_artifact("monte_carlo_results")[1]
+    mc_finals = load_mc_results_finals(results_path, file_mtime(results_path)) if results_path else None
+if mc_summary is None and mc_finals is not None and len(mc_finals):
+    mc_summary = summarize_finals(mc_finals, is_sorted=True)
+mc_stats = summary_metrics(mc_summary) if mc_summary else None
 
 st.sidebar.download_button(
     t("download_btn"),
@@ -594,7 +696,7 @@ else:
             rev_12m = f"+{((fc_last/last_price-1)*100):.1f}%"
         except: pass
 
-    var_val = f"{(mc_df['return_pct'].quantile(0.05)):.1f}%" if not mc_df.empty else "N/A"
+    var_val = f"{mc_stats['var_95'] * 100:.1f}%" if mc_stats else "N/A"
     att_rate = f"{hr_filt['Attrition_num'].mean()*100:.1f}%" if "Attrition_num" in hr_filt.columns and not hr_filt.empty else "N/A"
 
     pay_gap_val = "N/A"
@@ -698,26 +800,29 @@ else:
     # TAB 2: Análisis de Riesgo
     # ══════════════════════════════════
     with tab2:
-        if mc_df.empty:
+        if mc_stats is None:
             st.warning(t("no_data_warning"))
         else:
-            var_95 = mc_df["return_pct"].quantile(0.05)
-            cvar = mc_df[mc_df["return_pct"] <= var_95]["return_pct"].mean()
-            p50  = mc_df["return_pct"].median()
-            p95  = mc_df["return_pct"].quantile(0.95)
-            pct_pos = (mc_df["return_pct"] > 0).mean() * 100
+            var_95 = mc_stats["var_95"] * 100
+            cvar = mc_stats["cvar"] * 100
+            p50  = mc_stats["base_case"] * 100
+            p95  = mc_stats["best_case"] * 100
+            pct_pos = mc_stats["pct_positive"]
 
             st.markdown(f"### {t('mc_distribution')}")
+            st.caption(t("mc_model_caption").format(model=t(f"mc_model_{MC_VOLATILITY}")))
+            # Barras desde el histograma pre-agregado: el payload no depende de n_simulations
             fig_mc = go.Figure()
-            fig_mc.add_trace(go.Histogram(
-                x=mc_df["return_pct"], nbinsx=80,
-                marker_color="#3f5e5a", opacity=0.75, name="Simulations"
-            ))
-            var_x = mc_df["return_pct"][mc_df["return_pct"] <= var_95]
-            fig_mc.add_trace(go.Histogram(
-                x=var_x, nbinsx=20,
-                marker_color="#e05252", opacity=0.6, name="VaR Region"
-            ))
+            for edge_key, count_key, color, opacity, name in [
+                ("edges", "counts", "#3f5e5a", 0.75, "Simulations"),
+                ("tail_edges", "tail_counts", "#e05252", 0.6, "VaR Region"),
+            ]:
+                edges = (mc_summary[edge_key] - 1) * 100
+                fig_mc.add_trace(go.Bar(
+                    x=(edges[:-1] + edges[1:]) / 2, y=mc_summary[count_key], width=np.diff(edges),
+                    marker_color=color, opacity=opacity, name=name
+                ))
+            fig_mc.update_layout(barmode="overlay", bargap=0)
             for val, color, label in [
                 (var_95, "#e05252", f"VaR 95%: {var_95:.1f}%"),
                 (p50, "#8aaa9e", f"{t('base_case')}: {p50:.1f}%"),
@@ -729,17 +834,42 @@ else:
             st.plotly_chart(fig_mc, use_container_width=True)
 
             st.markdown(f"### {t('mc_fan_chart')}")
-            months = list(range(13))
-            p5_path  = [0] + [var_95*i/12 for i in range(1,13)]
-            p50_path = [0] + [p50*i/12 for i in range(1,13)]
-            p95_path = [0] + [p95*i/12 for i in range(1,13)]
+            mc_bands = load_mc_bands(file_mtime(BANDS_FILE))
+            if mc_bands is not None:
+                # Bandas reales P5/P25/P50/P75/P95 por mes calculadas por el pipeline
+                band_pct = (mc_bands - 1) * 100
+                months = list(range(band_pct.shape[1]))
+                p5_path, p25_path, p50_path, p75_path, p95_path = band_pct
+            else:
+                months = list(range(13))
+                p5_path  = [0] + [var_95*i/12 for i in range(1,13)]
+                p50_path = [0] + [p50*i/12 for i in range(1,13)]
+                p95_path = [0] + [p95*i/12 for i in range(1,13)]
 
             fig_fan = go.Figure()
+            paths_file = latest_npy(PATHS_FILE)
+            mc_paths = load_mc_paths(paths_file, file_mtime(paths_file)) if paths_file else None
+            if mc_paths is not None and len(mc_paths):
+                # Todas las trayectorias en una sola traza separadas por NaN
+                n_show = min(len(mc_paths), 2000)
+                traj = (np.asarray(mc_paths[:n_show], dtype=float) - 1) * 100
+                gap = np.full((n_show, 1), np.nan)
+                fig_fan.add_trace(go.Scattergl(
+                    x=np.tile(np.append(np.arange(traj.shape[1]), np.nan), n_show),
+                    y=np.hstack([traj, gap]).ravel(),
+                    mode="lines", name=t("mc_trajectories"), hoverinfo="skip",
+                    line=dict(color="rgba(138,170,158,0.06)", width=1)))
             fig_fan.add_trace(go.Scatter(x=months, y=p95_path, name=t("best_case"),
                 line=dict(color="#20fc8f", width=2), fill=None))
             fig_fan.add_trace(go.Scatter(x=months, y=p5_path, name=t("worst_case"),
                 line=dict(color="#e05252", width=2),
                 fill="tonexty", fillcolor="rgba(63,94,90,0.12)"))
+            if mc_bands is not None:
+                fig_fan.add_trace(go.Scatter(x=months, y=p75_path, name="P75",
+                    line=dict(color="#8aaa9e", width=1), showlegend=False))
+                fig_fan.add_trace(go.Scatter(x=months, y=p25_path, name="P25–P75",
+                    line=dict(color="#8aaa9e", width=1),
+                    fill="tonexty", fillcolor="rgba(32,252,143,0.12)"))
             fig_fan.add_trace(go.Scatter(x=months, y=p50_path, name=t("base_case"),
                 line=dict(color="#8aaa9e", width=2, dash="dot")))
             fig_fan.add_hline(y=0, line_color="rgba(32,252,143,0.2)", line_dash="dash")
@@ -757,6 +887,37 @@ else:
                    {t('risk_positive_text')}</p>
             </div>""", unsafe_allow_html=True)
 
+            if not prices.empty:
+                st.markdown(f"### {t('efficient_frontier')}")
+                # Opciones por clave (no por texto): la selección sobrevive al cambio de idioma
+                risk_key = st.radio(t("frontier_risk"), ["volatility", "cvar"], horizontal=True,
+                                    format_func=lambda k: t(f"frontier_risk_{k}"), key="t2_frontier")
+                front = load_frontier(prices, risk_key)
+                tick_cols = list(prices.columns)
+                risk_x = (front["volatility"] if risk_key == "volatility" else -front["cvar"]) * 100
+                ret_y = front["expected_return"] * 100
+                hover = front[tick_cols].apply(
+                    lambda r: "<br>".join(f"{c}: {v:.0%}" for c, v in r.items()), axis=1)
+                on_front = front["on_frontier"]
+                eq = front["equal_weight"]
+
+                fig_front = go.Figure()
+                fig_front.add_trace(go.Scattergl(
+                    x=risk_x, y=ret_y, mode="markers", name=t("frontier_points"),
+                    text=hover, hovertemplate="%{text}<extra></extra>",
+                    marker=dict(size=5, color=front["cvar"] * 100,
+                                colorscale=[[0, "#e05252"], [1, "#20fc8f"]], opacity=0.5)))
+                fig_front.add_trace(go.Scatter(
+                    x=risk_x[on_front].sort_values(), y=ret_y[on_front][risk_x[on_front].sort_values().index],
+                    mode="lines", name=t("frontier_line"), line=dict(color="#f0a500", width=3)))
+                fig_front.add_trace(go.Scatter(
+                    x=risk_x[eq], y=ret_y[eq], mode="markers", name=t("equal_weight"),
+                    marker=dict(size=14, color="#e8f4ed", symbol="star")))
+                fig_front.update_xaxes(title_text=f"{t(f'frontier_risk_{risk_key}')} (%)")
+                fig_front.update_yaxes(title_text=t("expected_return"))
+                apply_template(fig_front)
+                st.plotly_chart(fig_front, use_container_width=True)
+
     # ══════════════════════════════════
     # TAB 3: People Analytics
     # ══════════════════════════════════
@@ -765,7 +926,7 @@ else:
             st.warning(t("no_data_warning"))
         else:
             st.markdown(f"### {t('attrition_by_dept')}")
-            dept_att = hr_filt.groupby("Department")["Attrition_num"].mean().reset_index()
+            dept_att = hr_filt.groupby("Department", observed=True)["Attrition_num"].mean().reset_index()
             dept_att["pct"] = dept_att["Attrition_num"] * 100
             dept_att["color"] = dept_att["pct"].apply(
                 lambda x: "#e05252" if x>20 else ("#f0a500" if x>10 else "#20fc8f"))
@@ -814,7 +975,7 @@ else:
             st.markdown(f"### {t('satisfaction_heatmap')}")
             sat_cols = [c for c in ["JobSatisfaction","EnvironmentSatisfaction","WorkLifeBalance"] if c in hr_filt.columns]
             if sat_cols:
-                sat_dept = hr_filt.groupby("Department")[sat_cols].mean().round(2)
+                sat_dept = hr_filt.groupby("Department", observed=True)[sat_cols].mean().round(2)
                 fig_heat = go.Figure(go.Heatmap(
                     z=sat_dept.values, x=sat_cols, y=sat_dept.index,
                     colorscale=[[0,"#e05252"],[0.5,"#f0a500"],[1,"#20fc8f"]],
@@ -832,7 +993,7 @@ else:
             st.warning(t("no_data_warning"))
         else:
             st.markdown(f"### {t('pay_gap_chart')}")
-            dept_gender = hr_filt.groupby(["Department","Gender"])["MonthlyIncome"].mean().reset_index()
+            dept_gender = hr_filt.groupby(["Department","Gender"], observed=True)["MonthlyIncome"].mean().reset_index()
             fig_gap = px.bar(dept_gender, x="Department", y="MonthlyIncome", color="Gender",
                 barmode="group",
                 color_discrete_map={"Male":"#3f5e5a","Female":"#20fc8f"},
@@ -912,9 +1073,9 @@ else:
         except:
             arima_best_ret = 12.5
 
-        var_v = mc_df["return_pct"].quantile(0.05) if not mc_df.empty else -18.8
-        cvar_v = mc_df[mc_df["return_pct"]<=var_v]["return_pct"].mean() if not mc_df.empty else -25.5
-        pct_pos_v = (mc_df["return_pct"] > 0).mean() * 100 if not mc_df.empty else 75.7
+        var_v = mc_stats["var_95"] * 100 if mc_stats else -18.8
+        cvar_v = mc_stats["cvar"] * 100 if mc_stats else -25.5
+        pct_pos_v = mc_stats["pct_positive"] if mc_stats else 75.7
 
         sales_att = float(hr_df[hr_df["Department"]=="Sales"]["Attrition_num"].mean()*100) if "Attrition_num" in hr_df.columns else 20.6
         global_att = float(hr_df["Attrition_num"].mean()*100) if "Attrition_num" in hr_df.columns else 16.1
@@ -0,0 +1,191 @@
+# arima_cache.py — Caché persistente de modelos ARIMA ajustados
+"""
+Caché en disco (output/arima_cache/) de modelos ARIMA ajustados:
+  - Clave: ticker + hash de la serie + hash de los parámetros de búsqueda
+  - Hit exacto (misma serie): se reutiliza el modelo, sin ajustar
+  - Actualización incremental: si la serie cacheada es un prefijo de la
+    nueva (llegaron meses nuevos), se filtran sólo las observaciones nuevas
+    con los parámetros del modelo ya ajustado (statsmodels extend)
+  - Hit de orden (mismo ticker y parámetros, serie distinta): se reutiliza
+    el (p,d,q) elegido y sólo se reajustan los coeficientes
+  - Evicción LRU con límites de entradas y de bytes
+  - Con keep_in_memory, los modelos leídos/guardados quedan residentes
+    (proceso de larga vida, ver worker.py) y no se vuelven a deserializar
+
+Usado por financial_pipeline.run_arima_forecast.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = "output/arima_cache"
+
+
+def series_fingerprint(series: pd.Series) -> str:
+    """Hash de fechas + valores de la serie."""
+    h = hashlib.sha256()
+    h.update(np.asarray(series.index.asi8 if isinstance(series.index, pd.DatetimeIndex)
+                        else series.index, dtype=np.int64).tobytes())
+    h.update(np.asarray(series.values, dtype=np.float64).tobytes())
+    return h.hexdigest()[:32]
+
+
+def params_fingerprint(params: dict) -> str:
+    """Hash estable de los parámetros de búsqueda de auto_arima."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ArimaModelCache:
+    """
+    Índice JSON + un pickle por modelo. El índice guarda, por entrada:
+    ticker, params, data, order, n_obs, file, size, last_used.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_entries: int = 512,
+                 max_bytes: int = 256 * 2**20, keep_in_memory: bool = False):
+        self.cache_dir = cache_dir
+        self.resident = {} if keep_in_memory else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    # ── Índice ───────────────────────────────────────────────
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    @staticmethod
+    def key(ticker: str, data_hash: str, params_hash: str) -> str:
+        return f"{ticker}__{params_hash}__{data_hash}"
+
+    def _latest(self, ticker: str, params_hash: str) -> tuple:
+        """Entrada más reciente del ticker con los mismos parámetros."""
+        entries = [(k, e) for k, e in self.index.items()
+                   if e["ticker"] == ticker and e["params"] == params_hash]
+        return max(entries, key=lambda kv: kv[1]["last_used"], default=(None, None))
+
+    # ── Lectura / escritura ──────────────────────────────────
+    def _read_model(self, key: str, mutable: bool = False):
+        """Modelo de la entrada; mutable=True entrega una copia del residente."""
+        entry = self.index[key]
+        if self.resident is not None and key in self.resident:
+            entry["last_used"] = time.time()
+            model = self.resident[key]
+            return copy.deepcopy(model) if mutable else model
+        try:
+            with open(os.path.join(self.cache_dir, entry["file"]), "rb") as f:
+                model = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._drop(key)
+            return None
+        entry["last_used"] = time.time()
+        self._save_index()
+        if self.resident is not None:
+            self.resident[key] = copy.deepcopy(model) if mutable else model
+        return model
+
+    def lookup(self, ticker: str, series: pd.Series, params: dict) -> tuple:
+        """
+        ("hit", modelo) si la serie no cambió;
+        ("update", (modelo, nuevas_obs)) si la serie cacheada más reciente es
+            un prefijo de `series` (sólo llegaron observaciones nuevas);
+        ("order", entrada) si hay un modelo previo del ticker con otros datos;
+        ("miss", None) en otro caso.
+        """
+        params_hash = params_fingerprint(params)
+        key = self.key(ticker, series_fingerprint(series), params_hash)
+        if key in self.index:
+            model = self._read_model(key)
+            if model is not None:
+                return "hit", model
+
+        latest_key, entry = self._latest(ticker, params_hash)
+        if entry is None:
+            return "miss", None
+
+        n_obs = entry["n_obs"]
+        if n_obs < len(series) and series_fingerprint(series.iloc[:n_obs]) == entry["data"]:
+            model = self._read_model(latest_key, mutable=True)
+            if model is not None:
+                return "update", (model, series.iloc[n_obs:])
+        return "order", entry
+
+    def latest_model(self, ticker: str, params: dict) -> tuple:
+        """(entrada, modelo) más reciente del ticker con estos parámetros, o (None, None)."""
+        key, entry = self._latest(ticker, params_fingerprint(params))
+        if key is None:
+            return None, None
+        model = self._read_model(key)
+        return (entry, model) if model is not None else (None, None)
+
+    def store(self, ticker: str, series: pd.Series, params: dict, model) -> None:
+        data_hash = series_fingerprint(series)
+        params_hash = params_fingerprint(params)
+        key = self.key(ticker, data_hash, params_hash)
+        filename = f"{key}.pkl"
+        path = os.path.join(self.cache_dir, filename)
+        payload = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(path, "wb") as f:
+            f.write(payload)
+        if self.resident is not None:
+            self.resident[key] = model
+
+        self.index[key] = {
+            "ticker":         ticker,
+            "params":         params_hash,
+            "data":           data_hash,
+            "order":          list(model.order),
+            "with_intercept": bool(getattr(model, "with_intercept", True)),
+            "n_obs":          int(len(series)),
+            "last_date":      str(series.index[-1]),
+            "file":           filename,
+            "size":           os.path.getsize(path),
+            "last_used":      time.time(),
+        }
+        self._evict()
+        self._save_index()
+
+    # ── Evicción ─────────────────────────────────────────────
+    def _drop(self, key: str) -> None:
+        entry = self.index.pop(key, None)
+        if self.resident is not None:
+            self.resident.pop(key, None)
+        if entry is not None:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Elimina las entradas menos usadas hasta cumplir max_entries y max_bytes."""
+        by_age = sorted(self.index, key=lambda k: self.index[k]["last_used"])
+        total = sum(e["size"] for e in self.index.values())
+        while by_age and (len(self.index) > self.max_entries or total > self.max_bytes):
+            key = by_age.pop(0)
+            total -= self.index[key]["size"]
+            self._drop(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.index),
+            "bytes": sum(e["size"] for e in self.index.values()),
+            "resident": len(self.resident) if self.resident is not None else 0,
+        }
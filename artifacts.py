@@ -0,0 +1,305 @@
+# artifacts.py — Almacén de artefactos de los pipelines (columnar + CSV)
+"""
+Salidas tabulares de los pipelines (financial_clean, arima_forecast,
+monte_carlo_results, hr_clean) en archivos columnares tipados:
+  - "parquet" (zstd) o "feather" (Arrow IPC, zstd) si hay pyarrow
+  - "npz": fallback sin pyarrow, una entrada comprimida por columna
+    (categóricas como códigos + categorías, fechas como datetime64, nulos
+    como máscara) y dtypes de pandas restaurados desde el esquema al leer;
+    TypeError al escribir dtypes que no puede guardar sin pérdida
+  - Metadata de esquema en cada archivo: filas, dtype por columna,
+    columnas de índice, momento de escritura
+  - CSV como exportación opcional junto al columnar (notebooks, descargas)
+  - read_artifact con proyección de columnas y fallback al CSV si no hay
+    archivo columnar (p.ej. outputs versionados antes de este formato)
+
+Formato por defecto: FIN_ARTIFACT_FORMAT (parquet); CSV: FIN_ARTIFACT_CSV
+(1 = exportar también CSV).
+
+Usado por financial_pipeline.py, hr_pipeline.py y app.load_data.
+"""
+
+import datetime
+import json
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_DIR = "output"
+ARTIFACT_FORMAT = os.environ.get("FIN_ARTIFACT_FORMAT", "parquet")
+EXPORT_CSV = os.environ.get("FIN_ARTIFACT_CSV", "1") == "1"
+
+# Formatos columnares en orden de preferencia al leer
+COLUMNAR_FORMATS = ("parquet", "feather", "npz")
+EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "npz": ".npz", "csv": ".csv"}
+SCHEMA_KEY = "fin_artifact"
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(fmt: Optional[str] = None) -> str:
+    """Formato efectivo: parquet/feather degradan a npz si falta pyarrow."""
+    fmt = fmt or ARTIFACT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Formato de artefacto desconocido: {fmt!r} (opciones: {list(EXTENSIONS)})")
+    if fmt in ("parquet", "feather") and not _has_pyarrow():
+        return "npz"
+    return fmt
+
+
+def artifact_path(name: str, fmt: str, out_dir: str = OUTPUT_DIR) -> str:
+    return os.path.join(out_dir, name + EXTENSIONS[fmt])
+
+
+def _schema(frame: pd.DataFrame, name: str, fmt: str, index_cols: list, index_names: list) -> dict:
+    return {
+        "name":        name,
+        "format":      fmt,
+        "rows":        len(frame),
+        "columns":     {str(c): str(t) for c, t in frame.dtypes.items()},
+        "index":       index_cols,
+        "index_names": index_names,
+        "created":     datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# NPZ (fallback sin pyarrow)
+# ─────────────────────────────────────────────────────────────
+def _npz_strings(values, col: str) -> np.ndarray:
+    """Valores no nulos como array de texto; TypeError si alguno no es str."""
+    values = pd.Series(values, dtype=object)
+    bad = values[values.notna() & ~values.map(lambda v: isinstance(v, str))]
+    if len(bad):
+        raise TypeError(
+            f"npz: la columna {col!r} tiene valores {type(bad.iloc[0]).__name__} en un dtype "
+            f"de texto; conviértela a un dtype tipado o usa parquet/feather (pyarrow)"
+        )
+    return np.asarray(values.fillna("").astype(str), dtype=str)
+
+
+def _write_npz(frame: pd.DataFrame, path: str, schema: dict) -> None:
+    """
+    Una entrada por columna con el dtype de numpy más cercano; el dtype de
+    pandas queda en el esquema y _read_npz lo restaura. Máscara m<i> para
+    nulos de texto y de dtypes nullable (Int64, boolean, ...). TypeError
+    para lo que no se puede guardar sin pérdida (objetos no str, etc.).
+    """
+    arrays = {"__schema__": np.array(json.dumps(schema))}
+    for i, col in enumerate(frame.columns):
+        s = frame[col]
+        dtype = s.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            cats = s.cat.categories
+            arrays[f"c{i}"] = s.cat.codes.to_numpy()
+            arrays[f"k{i}"] = cats.to_numpy() if cats.dtype.kind in "biufmM" else _npz_strings(cats, col)
+            arrays[f"o{i}"] = np.array(bool(dtype.ordered))
+        elif isinstance(dtype, pd.DatetimeTZDtype):
+            arrays[f"v{i}"] = s.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            arrays[f"v{i}"] = _npz_strings(s, col)
+            if s.isna().any():
+                arrays[f"m{i}"] = s.isna().to_numpy()
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, "numpy_dtype"):
+            arrays[f"v{i}"] = s.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+            if s.isna().any():
+                arrays[f"m{i}"] = s.isna().to_numpy()
+        elif isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+            arrays[f"v{i}"] = s.to_numpy()
+        else:
+            raise TypeError(f"npz: dtype {dtype} de la columna {col!r} no soportado; usa parquet/feather (pyarrow)")
+    np.savez_compressed(path, **arrays)
+
+
+def _npz_column(z, i: int, dtype: str):
+    """Reconstruye la columna i con el dtype de pandas guardado en el esquema."""
+    if f"c{i}" in z:
+        ordered = bool(z[f"o{i}"]) if f"o{i}" in z else False
+        return pd.Categorical.from_codes(z[f"c{i}"], z[f"k{i}"], ordered=ordered)
+    target = pd.api.types.pandas_dtype(dtype)
+    values = pd.Series(z[f"v{i}"])
+    if isinstance(target, pd.DatetimeTZDtype):
+        return values.dt.tz_localize("UTC").dt.tz_convert(target.tz).astype(target)
+    if f"m{i}" in z:
+        values = values.astype(object)
+        values[z[f"m{i}"]] = None
+    return values.astype(target)
+
+
+def _read_npz(path: str, columns: Optional[list] = None) -> tuple:
+    with np.load(path, allow_pickle=False) as z:
+        schema = json.loads(str(z["__schema__"]))
+        names = list(schema["columns"])
+        wanted = names if columns is None else [c for c in names if c in set(columns) | set(schema["index"])]
+        data = {col: _npz_column(z, names.index(col), schema["columns"][col]) for col in wanted}
+    return pd.DataFrame(data), schema
+
+
+# ─────────────────────────────────────────────────────────────
+# ESCRITURA Y LECTURA
+# ─────────────────────────────────────────────────────────────
+def write_artifact(df: pd.DataFrame, name: str, fmt: Optional[str] = None, index: bool = False,
+                   csv: Optional[bool] = None, out_dir: str = OUTPUT_DIR) -> str:
+    """
+    Escribe `df` como output/<name>.<ext> en el formato columnar indicado
+    (index=True conserva el índice, p.ej. las fechas de los precios) y,
+    con csv=True (por defecto FIN_ARTIFACT_CSV), también output/<name>.csv.
+    Borra versiones del artefacto en otros formatos columnares.
+    Retorna la ruta del archivo principal.
+    """
+    fmt = resolve_format(fmt)
+    csv = EXPORT_CSV if csv is None else csv
+    os.makedirs(out_dir, exist_ok=True)
+
+    frame, index_cols, index_names = df.copy(deep=False), [], []
+    if index:
+        index_names = list(df.index.names)
+        index_cols = [n if n is not None else f"__index_{i}__" for i, n in enumerate(index_names)]
+        frame = df.rename_axis(index_cols).reset_index()
+    frame.columns = [str(c) for c in frame.columns]
+    schema = _schema(frame, name, fmt, index_cols, index_names)
+    path = artifact_path(name, fmt, out_dir)
+
+    if fmt in ("parquet", "feather"):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}), SCHEMA_KEY.encode(): json.dumps(schema).encode()}
+        table = table.replace_schema_metadata(metadata)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, path, compression="zstd")
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, path, compression="zstd")
+    elif fmt == "npz":
+        _write_npz(frame, path, schema)
+
+    if csv or fmt == "csv":
+        df.to_csv(artifact_path(name, "csv", out_dir), index=index)
+    for other in COLUMNAR_FORMATS:
+        stale = artifact_path(name, other, out_dir)
+        if other != fmt and os.path.exists(stale):
+            os.remove(stale)
+    return path
+
+
+def find_artifact(name: str, out_dir: str = OUTPUT_DIR) -> tuple:
+    """(formato, ruta) del artefacto: primero columnar, luego CSV. (None, None) si no existe."""
+    for fmt in COLUMNAR_FORMATS + ("csv",):
+        path = artifact_path(name, fmt, out_dir)
+        if os.path.exists(path):
+            return fmt, path
+    return None, None
+
+
+def read_artifact(name: str, columns: Optional[list] = None, out_dir: str = OUTPUT_DIR,
+                  parse_dates=None, index_col=None) -> pd.DataFrame:
+    """
+    Lee output/<name> desde el formato columnar disponible (sólo `columns`
+    si se indica) y restaura el índice guardado. Sin archivo columnar lee
+    el CSV con parse_dates/index_col. FileNotFoundError si no hay ninguno.
+    """
+    fmt, path = find_artifact(name, out_dir)
+    if fmt is None:
+        raise FileNotFoundError(f"No existe el artefacto {name!r} en {out_dir}/")
+
+    if fmt == "csv":
+        df = pd.read_csv(path, index_col=index_col, parse_dates=parse_dates)
+        return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+    if fmt == "npz":
+        df, schema = _read_npz(path, columns)
+    else:
+        schema = artifact_schema(name, out_dir)
+        wanted = None if columns is None else list(dict.fromkeys(schema["index"] + list(columns)))
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path, columns=wanted)
+        else:
+            import pyarrow.feather as feather
+
+            table = feather.read_table(path, columns=wanted)
+        df = table.to_pandas()
+
+    if schema["index"]:
+        df = df.set_index(schema["index"])
+        df.index.names = schema["index_names"]
+    return df
+
+
+def artifact_schema(name: str, out_dir: str = OUTPUT_DIR) -> Optional[dict]:
+    """Metadata de esquema guardada con el artefacto columnar (None si sólo hay CSV)."""
+    fmt, path = find_artifact(name, out_dir)
+    if fmt == "npz":
+        with np.load(path, allow_pickle=False) as z:
+            return json.loads(str(z["__schema__"]))
+    if fmt in ("parquet", "feather"):
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            metadata = pq.read_schema(path).metadata
+        else:
+            import pyarrow.ipc as ipc
+
+            with ipc.open_file(path) as reader:
+                metadata = reader.schema.metadata
+        return json.loads(metadata[SCHEMA_KEY.encode()])
+    return None
+
+
+# ─────────────────────────────────────────────────────────────
+# BENCHMARK
+# ─────────────────────────────────────────────────────────────
+def benchmark_artifacts(frames: dict, formats: Optional[tuple] = None, repeats: int = 3,
+                        out_file: str = "output/artifact_benchmark.csv") -> pd.DataFrame:
+    """
+    Tiempo de escritura/lectura (mejor de `repeats`) y tamaño en disco de
+    cada {nombre: DataFrame} en cada formato (por defecto los disponibles
+    + CSV), en un directorio temporal. Exporta out_file.
+    """
+    import tempfile
+
+    if formats is None:
+        formats = (("parquet", "feather") if _has_pyarrow() else ()) + ("npz", "csv")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, df in frames.items():
+            index = not isinstance(df.index, pd.RangeIndex)
+            for fmt in formats:
+                write_s, read_s = [], []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    path = write_artifact(df, name, fmt, index=index, csv=False, out_dir=tmp)
+                    write_s.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    if fmt == "csv":
+                        pd.read_csv(path, index_col=0 if index else None, parse_dates=index)
+                    else:
+                        read_artifact(name, out_dir=tmp)
+                    read_s.append(time.perf_counter() - start)
+                rows.append({
+                    "artifact": name, "format": fmt, "rows": len(df),
+                    "bytes": os.path.getsize(path),
+                    "write_seconds": round(min(write_s), 5),
+                    "read_seconds": round(min(read_s), 5),
+                })
+                os.remove(path)
+
+    report = pd.DataFrame(rows)
+    if out_file:
+        os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+        report.to_csv(out_file, index=False)
+    return report
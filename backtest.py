@@ -0,0 +1,183 @@
+# backtest.py — Backtest rolling-origin de los forecasters
+"""
+Evalúa los backends de run_arima_forecast sobre orígenes móviles:
+  1. Por ticker, cada origen t entrena con los datos anteriores a t y
+     pronostica los `horizon` meses siguientes (sólo orígenes con el
+     horizonte completo observado)
+  2. Métricas por origen: MAPE y cobertura de las bandas 80/95%
+  3. pmdarima: los orígenes se agrupan en bloques contiguos que corren en
+     paralelo (ProcessPoolExecutor); dentro de un bloque sólo el primer
+     origen hace la búsqueda auto_arima y los siguientes reutilizan el
+     orden y arrancan desde los coeficientes del origen anterior
+  4. "ar" (nativo): todos los tickers de un origen en un solo lote
+  5. Caché en output/backtest_cache.csv: cada fila se identifica por el
+     hash de los datos que usó (entrenamiento + horizonte), así que al
+     agregar meses sólo se evalúan los orígenes nuevos
+
+Usado por financial_pipeline.run_backtest.
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+CACHE_FILE = "output/backtest_cache.csv"
+METRIC_COLUMNS = ["ticker", "backend", "origin", "horizon", "n_train", "order",
+                  "mape", "coverage_80", "coverage_95", "key"]
+
+
+def origin_key(series: pd.Series, origin: int, horizon: int, backend: str, params: dict) -> str:
+    """Hash de los datos usados por un origen (entrenamiento + horizonte) y de la configuración."""
+    from arima_cache import params_fingerprint, series_fingerprint
+
+    h = hashlib.sha256()
+    h.update(series_fingerprint(series.iloc[:origin + horizon]).encode())
+    h.update(f"{backend}|{horizon}|{params_fingerprint(params)}".encode())
+    return h.hexdigest()[:32]
+
+
+def score_forecast(frame: pd.DataFrame, actual: np.ndarray) -> dict:
+    """MAPE (%) y cobertura de las bandas 80/95% de un forecast contra lo observado."""
+    actual = np.asarray(actual, dtype=float)
+    forecast = frame["forecast"].to_numpy()
+    out = {"mape": round(float(np.mean(np.abs(actual - forecast) / np.abs(actual)) * 100), 4)}
+    for level in (80, 95):
+        inside = (actual >= frame[f"lower_{level}"].to_numpy()) & (actual <= frame[f"upper_{level}"].to_numpy())
+        out[f"coverage_{level}"] = round(float(inside.mean()), 4)
+    return out
+
+
+def _backtest_block(task: tuple) -> list:
+    """
+    Bloque de orígenes contiguos de un ticker con pmdarima (ejecutable en
+    otro proceso). El primer origen busca el orden; los siguientes lo
+    reutilizan con arranque en los coeficientes del origen anterior.
+    """
+    from financial_pipeline import _arima_frame, _fit_arima_model, _log
+
+    ticker, series, origins, horizon, keys = task
+    rows = []
+    previous = None
+    for origin, key in zip(origins, keys):
+        train = series.iloc[:origin]
+        try:
+            warm = None if previous is None else {
+                "order": previous.order,
+                "with_intercept": previous.with_intercept,
+                "start_params": previous.params(),
+            }
+            model = _fit_arima_model(ticker, train, warm)
+            frame = _arima_frame(ticker, model, train, horizon)
+        except Exception as e:
+            _log(f"[ERROR] Backtest {ticker} @ {series.index[origin].date()}: {e}")
+            previous = None
+            continue
+        previous = model
+        rows.append({
+            "ticker": ticker, "backend": "pmdarima", "origin": series.index[origin],
+            "horizon": horizon, "n_train": origin, "order": str(model.order),
+            **score_forecast(frame, series.iloc[origin:origin + horizon].to_numpy()),
+            "key": key,
+        })
+    return rows
+
+
+def _backtest_native(prices: pd.DataFrame, pending: dict, horizon: int, backend: str) -> list:
+    """Orígenes de un backend nativo: todos los tickers de una misma fecha en un lote."""
+    from forecasting import FORECAST_BACKENDS
+
+    by_date = {}
+    for ticker, items in pending.items():
+        for origin, key in items:
+            by_date.setdefault(prices[ticker].dropna().index[origin], []).append((ticker, origin, key))
+
+    rows = []
+    for date, items in sorted(by_date.items()):
+        tickers = [ticker for ticker, _, _ in items]
+        frames = FORECAST_BACKENDS[backend](prices.loc[prices.index < date, tickers], horizon)
+        for ticker, origin, key in items:
+            frame = frames[frames["ticker"] == ticker]
+            if len(frame) < horizon:
+                continue
+            series = prices[ticker].dropna()
+            rows.append({
+                "ticker": ticker, "backend": backend, "origin": date,
+                "horizon": horizon, "n_train": origin, "order": "",
+                **score_forecast(frame, series.iloc[origin:origin + horizon].to_numpy()),
+                "key": key,
+            })
+    return rows
+
+
+def rolling_backtest(prices: pd.DataFrame, backend: str = "pmdarima", horizon: int = 12,
+                     min_train: int = 36, step: int = 1, block_size: int = 6,
+                     n_workers: Optional[int] = None, cache_file: str = CACHE_FILE) -> pd.DataFrame:
+    """
+    Backtest rolling-origin por ticker: orígenes min_train, min_train+step, ...
+    mientras quede el horizonte completo. Retorna una fila por (ticker,
+    origen) con MAPE y cobertura 80/95%. Con cache_file=None no se lee ni
+    escribe caché.
+    """
+    from financial_pipeline import ARIMA_SEARCH, _log
+    from monte_carlo import resolve_workers
+
+    params = ARIMA_SEARCH if backend == "pmdarima" else {}
+    cached = pd.DataFrame(columns=METRIC_COLUMNS)
+    if cache_file and os.path.exists(cache_file):
+        cached = pd.read_csv(cache_file, parse_dates=["origin"], dtype={"order": str})
+
+    known = set(cached["key"])
+    pending = {}
+    keys_needed = set()
+    for ticker in prices.columns:
+        series = prices[ticker].dropna()
+        origins = range(min_train, len(series) - horizon + 1, step)
+        items = [(o, origin_key(series, o, horizon, backend, params)) for o in origins]
+        keys_needed.update(key for _, key in items)
+        missing = [(o, key) for o, key in items if key not in known]
+        if missing:
+            pending[ticker] = missing
+
+    n_pending = sum(len(v) for v in pending.values())
+    _log(f"[OK] Backtest {backend}: {len(keys_needed)} orígenes, "
+         f"{len(keys_needed) - n_pending} desde caché, {n_pending} a evaluar.")
+
+    if backend == "pmdarima":
+        tasks = []
+        for ticker, items in pending.items():
+            series = prices[ticker].dropna()
+            for start in range(0, len(items), block_size):
+                block = items[start:start + block_size]
+                tasks.append((ticker, series, [o for o, _ in block], horizon, [k for _, k in block]))
+
+        n_workers = min(resolve_workers(n_workers), max(len(tasks), 1))
+        if n_workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                blocks = list(pool.map(_backtest_block, tasks))
+        else:
+            blocks = [_backtest_block(task) for task in tasks]
+        new_rows = [row for rows in blocks for row in rows]
+    else:
+        new_rows = _backtest_native(prices, pending, horizon, backend) if pending else []
+
+    new = pd.DataFrame(new_rows, columns=METRIC_COLUMNS)
+    results = pd.concat([cached, new], ignore_index=True) if len(cached) else new
+    if cache_file:
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        results.drop_duplicates("key", keep="last").to_csv(cache_file, index=False)
+
+    results = results[results["key"].isin(keys_needed)]
+    return results.sort_values(["ticker", "origin"]).reset_index(drop=True)
+
+
+def backtest_summary(results: pd.DataFrame) -> pd.DataFrame:
+    """MAPE medio y cobertura observada por ticker y backend."""
+    return (results.groupby(["backend", "ticker"], sort=False)
+            .agg(origins=("mape", "size"), mape=("mape", "mean"),
+                 coverage_80=("coverage_80", "mean"), coverage_95=("coverage_95", "mean"))
+            .round(4).reset_index())
@@ -1,21 +1,22 @@
 # financial_pipeline.py — ARIMA + Monte Carlo + yfinance
 """
 Pipeline financiero:
-  1. Descarga datos históricos con yfinance (fallback sintético)
+  1. Descarga incremental con yfinance (sólo barras nuevas, almacén columnar; fallback sintético)
   2. Modelos ARIMA individuales por ticker con auto_arima
   3. Simulación Monte Carlo del portfolio completo
 
-Exporta:
+Exporta (artefactos columnares de artifacts.py + CSV):
   data/financial_data.csv
-  output/financial_clean.csv
-  output/arima_forecast.csv
-  output/monte_carlo_results.csv
+  output/financial_clean.{parquet,csv}
+  output/arima_forecast.{parquet,csv}
+  output/monte_carlo_results.{parquet,csv}
 """
 
 import os
 import datetime
 import traceback
 import warnings
+from typing import Optional
 warnings.filterwarnings("ignore")
 
 import numpy as np
@@ -36,178 +37,538 @@ def _log(msg: str):
 # ─────────────────────────────────────────────────────────────
 # STEP 1: DESCARGA / DATOS SINTÉTICOS
 # ─────────────────────────────────────────────────────────────
-def _synthetic_prices(ticker: str, periods: int = 60) -> pd.Series:
-    """Genera serie de precios sintéticos si yfinance falla."""
+def _synthetic_prices(ticker: str, periods: int = 60, freq: str = "MS",
+                      steps_per_month: float = 1.0) -> pd.Series:
+    """
+    Genera serie de precios sintéticos si yfinance falla.
+    Con otra frecuencia (p.ej. "B" y 21 pasos por mes) tendencia y ruido se
+    escalan para mantener la misma dinámica mensual.
+    """
     np.random.seed(abs(hash(ticker)) % (2**31))
     base = {"AAPL": 150, "MSFT": 280, "GOOGL": 130, "AMZN": 170}.get(ticker, 100)
-    trend = 0.008
+    trend = 0.008 / steps_per_month
     seasonality = 0.05 * np.sin(np.linspace(0, 4 * np.pi, periods))
-    noise = np.random.normal(0, 0.04, periods)
+    noise = np.random.normal(0, 0.04 / np.sqrt(steps_per_month), periods)
     log_returns = trend + seasonality / periods + noise
     prices = base * np.exp(np.cumsum(log_returns))
     idx = pd.date_range(
-        end=datetime.date.today(), periods=periods, freq="MS"
+        end=datetime.date.today(), periods=periods, freq=freq
     )
     return pd.Series(prices, index=idx, name=ticker)
 
 
-def load_financial_data() -> pd.DataFrame:
-    """Descarga 5 años de datos mensuales; fallback sintético si falla."""
+def load_financial_data(interval: str = "1mo", model_freq: str = "MS",
+                        provider=None) -> pd.DataFrame:
+    """
+    Precios de cierre de TICKERS (5 años mensuales por defecto) desde el
+    almacén columnar (price_store.py), descargando sólo las barras que
+    faltan desde la última guardada (provider: yfinance por defecto).
+    Si la descarga falla se usan los datos guardados; sin datos guardados,
+    fallback sintético. Con interval diario/intradía ("1d", "1h", "5m"...)
+    las barras se remuestrean a `model_freq` (None = frecuencia original).
+    """
+    from price_store import (
+        INTERVAL_FREQ, INTERVAL_MAX_DAYS, INTERVAL_STEPS_PER_MONTH,
+        YFinanceProvider, read_prices, refresh_prices, resample_prices,
+    )
+
+    if interval not in INTERVAL_FREQ:
+        raise ValueError(f"interval debe ser uno de {list(INTERVAL_FREQ)}")
     os.makedirs("data", exist_ok=True)
     cache = "data/financial_data.csv"
+    provider = provider or YFinanceProvider()
 
     try:
-        import yfinance as yf
-        end = datetime.date.today()
-        start = end - datetime.timedelta(days=5 * 365)
-        raw = yf.download(
-            TICKERS, start=start.isoformat(), end=end.isoformat(),
-            interval="1mo", auto_adjust=True, progress=False
-        )
-        close = raw["Close"] if "Close" in raw.columns else raw.xs("Close", axis=1, level=0)
-        close = close.dropna()
-        if close.empty or len(close) < 10:
-            raise ValueError("Datos insuficientes de yfinance.")
+        report = refresh_prices(TICKERS, interval, provider)
+        _log(f"[OK] {provider.name}: {sum(report['fetched'].values())} barras ({interval}) "
+             f"descargadas en {report['requests']} pedidos {report['fetched']}.")
+        if report["rebased"]:
+            _log(f"[WARN] {report['rebased']}: historia re-ajustada por el proveedor "
+                 f"(split/dividendo); re-descargada completa.")
+    except Exception as e:
+        _log(f"[WARN] {provider.name} falló: {e}.")
+
+    start = datetime.date.today() - datetime.timedelta(days=INTERVAL_MAX_DAYS[interval])
+    close = read_prices(interval, TICKERS, start=start.isoformat())
+    missing = [t for t in TICKERS if t not in close.columns]
+    close = close.dropna()
+    if missing or len(close) < 10:
+        _log(f"[WARN] Datos insuficientes en el almacén (faltan {missing}). Usando datos sintéticos.")
+        steps = INTERVAL_STEPS_PER_MONTH[interval]
+        periods = int(round(INTERVAL_MAX_DAYS[interval] / 30.44 * steps)) if interval != "1mo" else 60
+        series = {t: _synthetic_prices(t, periods, INTERVAL_FREQ[interval], steps) for t in TICKERS}
+        close = pd.DataFrame(series)
         close.index = pd.to_datetime(close.index)
-        close.index = close.index.tz_localize(None)
-        close.to_csv(cache)
-        _log(f"[OK] yfinance: {len(close)} filas descargadas para {TICKERS}.")
-        return close
+        _log(f"[OK] Sintético: {len(close)} filas ({interval}) generadas.")
+    else:
+        close = close[TICKERS]
+        _log(f"[OK] Almacén columnar: {close.shape} ({interval}).")
 
-    except Exception as e:
-        _log(f"[WARN] yfinance falló: {e}. Usando datos sintéticos.")
-        series = {t: _synthetic_prices(t) for t in TICKERS}
-        df = pd.DataFrame(series)
-        df.index = pd.to_datetime(df.index)
-        df.to_csv(cache)
-        _log(f"[OK] Sintético: {len(df)} filas generadas.")
-        return df
+    if interval != "1mo" and model_freq:
+        close = resample_prices(close, model_freq)
+        _log(f"[OK] Remuestreo {interval} → {model_freq}: {len(close)} filas.")
+    close.to_csv(cache)
+    return close
 
 
 # ─────────────────────────────────────────────────────────────
 # STEP 2: MODELO ARIMA
 # ─────────────────────────────────────────────────────────────
-def run_arima_forecast(prices: pd.DataFrame, n_forecast: int = 12) -> pd.DataFrame:
+# Parámetros de la búsqueda stepwise de auto_arima (forman parte de la clave de caché)
+ARIMA_SEARCH = {
+    "start_p": 0, "start_q": 0, "max_p": 3, "max_q": 3,
+    "seasonal": False, "stepwise": True, "information_criterion": "aic",
+}
+
+
+def _fit_arima_model(ticker: str, series: pd.Series, cached: Optional[dict] = None, d: Optional[int] = None):
+    """
+    Test ADF → auto_arima. Con `cached` (entrada de ArimaModelCache) se
+    reutiliza el orden (p,d,q) ya elegido y sólo se reajustan los coeficientes
+    (desde cached["start_params"] si está, p.ej. en el backtest).
+    Con `d` (del screening en lote de forecasting.screen_stationarity) se
+    omite el ADF individual.
+    """
+    if cached is not None:
+        from pmdarima import ARIMA
+
+        model = ARIMA(
+            order=tuple(cached["order"]), with_intercept=cached["with_intercept"],
+            start_params=cached.get("start_params"), suppress_warnings=True,
+        ).fit(series)
+        _log(f"[OK] {ticker}: orden {model.order} desde caché → sólo coeficientes.")
+        return model
+
+    from pmdarima import auto_arima
+
+    # ADF Test
+    if d is None:
+        from statsmodels.tsa.stattools import adfuller
+
+        adf_pval = adfuller(series)[1]
+        d = 0 if adf_pval < 0.05 else 1
+        _log(f"[OK] {ticker}: ADF p={adf_pval:.4f} → d={d}")
+
+    # auto_arima
+    return auto_arima(
+        series, d=d, suppress_warnings=True,
+        error_action="ignore", **ARIMA_SEARCH,
+    )
+
+
+def _update_arima_model(ticker: str, model, new_obs: pd.Series):
+    """
+    Agrega observaciones nuevas a un modelo ya ajustado sin reestimar:
+    statsmodels extend filtra sólo las obs nuevas desde el último estado
+    del filtro de Kalman con los mismos parámetros (costo proporcional a
+    los datos nuevos). pmdarima update, en cambio, reajusta sobre toda la
+    historia. Los coeficientes quedan fijos: la deriva respecto de un
+    reajuste completo se mide en benchmark_arima_update.
+    """
+    model.arima_res_ = model.arima_res_.extend(np.asarray(new_obs, dtype=float))
+    _log(f"[OK] {ticker}: {model.order} extendido con {len(new_obs)} obs nuevas (parámetros fijos).")
+    return model
+
+
+def _arima_frame(ticker: str, model, series: pd.Series, n_forecast: int = 12,
+                 levels=None) -> pd.DataFrame:
+    """
+    Forecast + IC en formato largo con una sola llamada a predict: el error
+    estándar se deduce del IC 95% y cada nivel de `levels` (default 80/95)
+    se deriva de él sin volver a consultar el modelo.
+    """
+    from forecasting import CI_LEVELS, forecast_frame, future_dates, se_from_interval
+
+    forecast_vals, ci_95 = model.predict(n_periods=n_forecast, return_conf_int=True, alpha=0.05)
+    ci_95 = np.asarray(ci_95)
+    se = se_from_interval(ci_95[:, 0], ci_95[:, 1], level=95)
+
+    future_idx = future_dates(series.index, n_forecast)
+    return forecast_frame(ticker, future_idx, np.asarray(forecast_vals), se, levels or CI_LEVELS)
+
+
+def _fit_arima_ticker(ticker: str, series: pd.Series, n_forecast: int = 12,
+                      cached: Optional[dict] = None, levels=None, d: Optional[int] = None) -> Optional[dict]:
+    """
+    Ajuste + forecast de un ticker.
+    Función de módulo para poder ejecutarse en un proceso worker.
+    Retorna {"frame": DataFrame largo, "model": modelo} o None si falla.
+    """
+    try:
+        model = _fit_arima_model(ticker, series, cached, d)
+        frame = _arima_frame(ticker, model, series, n_forecast, levels)
+        _log(f"[OK] ARIMA {ticker}: {model.order} → forecast 12M ok.")
+        return {"frame": frame, "model": model}
+
+    except Exception as e:
+        _log(f"[ERROR] ARIMA {ticker}: {e}")
+        _log(traceback.format_exc())
+        return None
+
+
+def _arima_worker(conn, n_forecast: int, levels) -> None:
+    """Proceso worker: recibe tareas (ticker, serie, entrada de caché, d) por `conn` hasta recibir None."""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        ticker, series, cached, d = task
+        conn.send(_fit_arima_ticker(ticker, series, n_forecast, cached, levels, d))
+
+
+def _fit_arima_parallel(tasks: list, n_forecast: int, n_workers: int,
+                        timeout: Optional[float] = None, levels=None) -> dict:
+    """
+    Ajusta los tickers en n_workers procesos propios, cada uno con su pipe
+    y como máximo una tarea en vuelo: el timeout de cada ticker se mide
+    desde que su worker la recibe. Un worker que vence o muere se termina
+    y se reemplaza por uno nuevo; su ticker se descarta (el culpable se
+    conoce exactamente) y el resto sigue.
+    Retorna {ticker: {"frame", "model"}}.
+    """
+    import multiprocessing as mp
+    import time
+    from multiprocessing.connection import wait
+
+    ctx = mp.get_context()
+
+    def start_worker() -> dict:
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_arima_worker, args=(child, n_forecast, levels), daemon=True)
+        proc.start()
+        child.close()
+        return {"proc": proc, "conn": parent, "task": None, "deadline": None}
+
+    def stop_worker(worker: dict) -> None:
+        worker["proc"].terminate()
+        worker["proc"].join()
+        worker["conn"].close()
+
+    frames = {}
+    pending = list(tasks)
+    workers = [start_worker() for _ in range(min(n_workers, len(tasks)))]
+    try:
+        while pending or any(w["task"] for w in workers):
+            for w in workers:
+                if w["task"] is None and pending:
+                    w["task"] = pending.pop(0)
+                    w["deadline"] = time.monotonic() + timeout if timeout else None
+                    w["conn"].send(w["task"])
+
+            busy = [w for w in workers if w["task"] is not None]
+            deadlines = [w["deadline"] for w in busy if w["deadline"] is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            wait([w["conn"] for w in busy] + [w["proc"].sentinel for w in busy], timeout=wait_for)
+
+            now = time.monotonic()
+            for i, w in enumerate(workers):
+                if w["task"] is None:
+                    continue
+                ticker = w["task"][0]
+                if w["conn"].poll():
+                    try:
+                        result = w["conn"].recv()
+                    except (EOFError, OSError):
+                        result = None
+                        _log(f"[ERROR] ARIMA {ticker}: el worker murió durante el ajuste. Skip.")
+                        stop_worker(w)
+                        workers[i] = start_worker() if pending else None
+                        continue
+                    if result is not None:
+                        frames[ticker] = result
+                    w["task"] = None
+                elif not w["proc"].is_alive():
+                    _log(f"[ERROR] ARIMA {ticker}: el worker murió durante el ajuste "
+                         f"(código {w['proc'].exitcode}). Skip.")
+                    stop_worker(w)
+                    workers[i] = start_worker() if pending else None
+                elif w["deadline"] is not None and now >= w["deadline"]:
+                    # Un fit colgado no se puede cancelar: terminar su proceso
+                    _log(f"[ERROR] ARIMA {ticker}: timeout ({timeout}s). Skip.")
+                    stop_worker(w)
+                    workers[i] = start_worker() if pending else None
+            workers = [w for w in workers if w is not None]
+    finally:
+        for w in workers:
+            if w["proc"].is_alive() and w["task"] is None:
+                try:
+                    w["conn"].send(None)
+                except OSError:
+                    pass
+                w["proc"].join(timeout=5)
+            stop_worker(w)
+
+    return frames
+
+
+def run_arima_forecast(prices: pd.DataFrame, n_forecast: int = 12,
+                       n_workers: Optional[int] = None, timeout: Optional[float] = None,
+                       use_cache: bool = False, cache_dir: Optional[str] = None,
+                       levels=None, backend: str = "pmdarima",
+                       cache=None) -> pd.DataFrame:
     """
     Test ADF → auto_arima → forecast 12 meses + IC 80/95%.
+    `backend` elige el forecaster: "pmdarima" (búsqueda auto_arima completa,
+    corrida nocturna) o uno nativo de forecasting.FORECAST_BACKENDS, p.ej.
+    "ar" (AR por mínimos cuadrados en lote, para refrescos rápidos; ignora
+    n_workers, timeout y caché).
+    `levels` (p.ej. (50, 80, 90, 95, 99)) pide otras bandas: todas salen
+    del mismo forecast + error estándar, sin costo extra de modelo.
+    Con n_workers > 1 (o -1 = todos los núcleos) los tickers se ajustan en
+    paralelo en un pool de procesos; `timeout` (segundos) limita cada
+    ticker. Un ticker que falla o vence no detiene al resto.
+    Con use_cache, los modelos se guardan en output/arima_cache/: si la
+    serie no cambió no se ajusta nada; si sólo llegaron observaciones
+    nuevas se actualiza el modelo con ellas (ver benchmark_arima_update);
+    si cambió la historia se reutiliza el orden (p,d,q) y sólo se
+    reajustan los coeficientes. `cache` acepta una ArimaModelCache ya
+    abierta (p.ej. la residente del worker) en lugar de use_cache/cache_dir.
     Retorna DataFrame con columnas: ticker, date, forecast,
-      lower_80, upper_80, lower_95, upper_95
+      lower_80, upper_80, lower_95, upper_95 (o lower_/upper_ de cada nivel)
     """
-    from pmdarima import auto_arima
-    from statsmodels.tsa.stattools import adfuller
+    from forecasting import CI_LEVELS, FORECAST_BACKENDS, band_columns, screen_stationarity
+
+    levels = levels or CI_LEVELS
+    if backend != "pmdarima":
+        if backend not in FORECAST_BACKENDS:
+            raise ValueError(f"backend debe ser 'pmdarima' o uno de {sorted(FORECAST_BACKENDS)}")
+        return _save_forecast(FORECAST_BACKENDS[backend](prices, n_forecast, levels))
 
-    results = []
+    from arima_cache import CACHE_DIR, ArimaModelCache
+    from monte_carlo import resolve_workers
 
+    if cache is None and use_cache:
+        cache = ArimaModelCache(cache_dir or CACHE_DIR)
+    results = {}
+    tasks = []
     for ticker in prices.columns:
         series = prices[ticker].dropna()
         if len(series) < 12:
             _log(f"[WARN] {ticker}: serie muy corta ({len(series)} obs). Skip ARIMA.")
             continue
 
-        try:
-            # ADF Test
-            adf_result = adfuller(series)
-            adf_pval = adf_result[1]
-            d_param = 0 if adf_pval < 0.05 else 1
-            _log(f"[OK] {ticker}: ADF p={adf_pval:.4f} → d={d_param}")
-
-            # auto_arima
-            model = auto_arima(
-                series, d=d_param, start_p=0, start_q=0,
-                max_p=3, max_q=3, seasonal=False,
-                stepwise=True, suppress_warnings=True,
-                error_action="ignore", information_criterion="aic",
-            )
-
-            # Forecast
-            fc_80 = model.predict(n_periods=n_forecast, return_conf_int=True, alpha=0.20)
-            fc_95 = model.predict(n_periods=n_forecast, return_conf_int=True, alpha=0.05)
-
-            forecast_vals = fc_80[0]
-            ci_80 = fc_80[1]
-            ci_95 = fc_95[1]
-
-            future_idx = pd.date_range(
-                start=series.index[-1] + pd.DateOffset(months=1),
-                periods=n_forecast, freq="MS"
-            )
-
-            for i in range(n_forecast):
-                results.append({
-                    "ticker": ticker,
-                    "date": future_idx[i],
-                    "forecast": round(float(forecast_vals[i]), 4),
-                    "lower_80": round(float(ci_80[i][0]), 4),
-                    "upper_80": round(float(ci_80[i][1]), 4),
-                    "lower_95": round(float(ci_95[i][0]), 4),
-                    "upper_95": round(float(ci_95[i][1]), 4),
-                })
-
-            _log(f"[OK] ARIMA {ticker}: {model.order} → forecast 12M ok.")
+        cached = None
+        if cache is not None:
+            status, found = cache.lookup(ticker, series, ARIMA_SEARCH)
+            if status == "hit":
+                try:
+                    results[ticker] = {"frame": _arima_frame(ticker, found, series, n_forecast, levels)}
+                    _log(f"[OK] ARIMA {ticker}: {found.order} desde caché (serie sin cambios).")
+                    continue
+                except Exception as e:
+                    _log(f"[WARN] ARIMA {ticker}: modelo en caché inválido ({e}). Reajustando.")
+            elif status == "update":
+                try:
+                    model = _update_arima_model(ticker, *found)
+                    results[ticker] = {"frame": _arima_frame(ticker, model, series, n_forecast, levels)}
+                    cache.store(ticker, series, ARIMA_SEARCH, model)
+                    continue
+                except Exception as e:
+                    _log(f"[WARN] ARIMA {ticker}: update incremental falló ({e}). Reajustando.")
+            elif status == "order":
+                cached = found
+        tasks.append((ticker, series, cached))
+
+    # Screening ADF/KPSS en lote de los tickers que necesitan búsqueda de orden
+    to_search = [ticker for ticker, _, cached in tasks if cached is None]
+    screen = screen_stationarity(prices[to_search]) if to_search else pd.DataFrame()
+    if len(screen):
+        _log(f"[QA] Screening de estacionariedad en lote:\n{screen.to_string()}")
+    tasks = [(ticker, series, cached,
+              int(screen.loc[ticker, "d"]) if cached is None and ticker in screen.index else None)
+             for ticker, series, cached in tasks]
+
+    n_workers = min(resolve_workers(n_workers), max(len(tasks), 1))
+    if n_workers > 1:
+        fitted = _fit_arima_parallel(tasks, n_forecast, n_workers, timeout, levels)
+    else:
+        fitted = {ticker: _fit_arima_ticker(ticker, series, n_forecast, cached, levels, d)
+                  for ticker, series, cached, d in tasks}
+
+    for ticker, series, *_ in tasks:
+        result = fitted.get(ticker)
+        if result is None:
+            continue
+        results[ticker] = result
+        if cache is not None:
+            cache.store(ticker, series, ARIMA_SEARCH, result["model"])
+    if cache is not None:
+        _log(f"[QA] Caché ARIMA: {cache.stats()['entries']} modelos, "
+             f"{cache.stats()['bytes'] / 2**20:.1f} MB.")
+
+    # Mismo orden de tickers que prices, sea cual sea el orden de llegada
+    ordered = [results[t]["frame"] for t in prices.columns if t in results]
+    df_fc = pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame(
+        columns=["ticker", "date", "forecast"] + band_columns(levels)
+    )
+    return _save_forecast(df_fc)
+
+
+def _save_forecast(df_fc: pd.DataFrame) -> pd.DataFrame:
+    from artifacts import write_artifact
+
+    path = write_artifact(df_fc, "arima_forecast")
+    _log(f"[QA] {path}: {len(df_fc)} filas. Tickers: {df_fc['ticker'].unique().tolist()}")
+    return df_fc
 
+
+def benchmark_arima_update(prices: pd.DataFrame, n_new: int = 1,
+                           n_forecast: int = 12) -> pd.DataFrame:
+    """
+    Compara, por ticker, extender con las últimas n_new observaciones un
+    modelo ajustado sin ellas (parámetros fijos, ver _update_arima_model)
+    vs re-ajustar todo desde cero (auto_arima): tiempo de cada camino y
+    deriva del forecast (media y máximo de la diferencia relativa entre
+    ambos forecasts), que crece con n_new al no reestimar coeficientes.
+    Exporta output/arima_update_benchmark.csv.
+    """
+    import copy
+    import time
+
+    rows = []
+    for ticker in prices.columns:
+        series = prices[ticker].dropna()
+        if len(series) < 12 + n_new:
+            continue
+        try:
+            base = _fit_arima_model(ticker, series.iloc[:-n_new])
+
+            t0 = time.perf_counter()
+            full = _fit_arima_model(ticker, series)
+            t_full = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            updated = _update_arima_model(ticker, copy.deepcopy(base), series.iloc[-n_new:])
+            t_update = time.perf_counter() - t0
+
+            fc_full = np.asarray(full.predict(n_periods=n_forecast))
+            fc_upd = np.asarray(updated.predict(n_periods=n_forecast))
+            drift = np.abs(fc_upd / fc_full - 1) * 100
+            rows.append({
+                "ticker":         ticker,
+                "n_new":          n_new,
+                "order_full":     str(full.order),
+                "order_update":   str(updated.order),
+                "refit_seconds":  round(t_full, 4),
+                "update_seconds": round(t_update, 4),
+                "speedup":        round(t_full / t_update, 1) if t_update else np.nan,
+                "drift_mean_pct": round(float(drift.mean()), 4),
+                "drift_max_pct":  round(float(drift.max()), 4),
+            })
         except Exception as e:
-            _log(f"[ERROR] ARIMA {ticker}: {e}")
-            _log(traceback.format_exc())
+            _log(f"[ERROR] Benchmark update {ticker}: {e}")
 
-    df_fc = pd.DataFrame(results)
+    df_bench = pd.DataFrame(rows)
     os.makedirs("output", exist_ok=True)
-    df_fc.to_csv("output/arima_forecast.csv", index=False)
-    _log(f"[QA] arima_forecast.csv: {len(df_fc)} filas. Tickers: {df_fc['ticker'].unique().tolist()}")
-    return df_fc
+    df_bench.to_csv("output/arima_update_benchmark.csv", index=False)
+    _log(f"[QA] Benchmark update incremental vs refit:\n{df_bench.to_string(index=False)}")
+    return df_bench
 
 
 # ─────────────────────────────────────────────────────────────
 # STEP 3: MONTE CARLO
 # ─────────────────────────────────────────────────────────────
-def run_monte_carlo(prices: pd.DataFrame, n_simulations: int = 5000, n_months: int = 12) -> dict:
+def run_monte_carlo(prices: pd.DataFrame, n_simulations: int = 5000, n_months: int = 12,
+                    seed: int = 42, chunk_size: Optional[int] = None, n_workers: Optional[int] = None,
+                    n_paths: int = 500, path_store: str = "memory",
+                    sampling: str = "pseudo", volatility: Optional[str] = None) -> dict:
     """
     Simulación Monte Carlo del portfolio igualitario.
+    Los retornos se miden en la frecuencia de `prices`: n_months son pasos
+    de esa frecuencia (meses con los datos mensuales por defecto).
+    Motor vectorizado: una sola factorización de la covarianza y un único
+    tensor de shocks (ver monte_carlo.py).
+
+    Con chunk_size, modo streaming: simula por bloques y acumula métricas
+    en un sketch de cuantiles con memoria constante. En ese modo `finals`,
+    monte_carlo_results y monte_carlo_finals.npy contienen sólo la muestra
+    del primer bloque (monte_carlo_summary.npz sí cubre todas las
+    simulaciones, desde el sketch), y `sketch_report` indica la distancia
+    entre percentiles del sketch y exactos.
+
+    Con n_workers > 1 (o -1 = todos los núcleos) los bloques se reparten en
+    un ProcessPoolExecutor; cada bloque tiene su propio stream derivado de
+    `seed`, así el resultado es reproducible para el mismo número de procesos.
+
+    Las primeras n_paths trayectorias se guardan en un PathStore float32
+    ("memory", "shm" o "memmap" → output/monte_carlo_paths.npy). Con "shm"
+    el llamador debe cerrar y liberar `path_store` al terminar.
+
+    sampling: "pseudo", "antithetic", "sobol" o "halton" (ver
+    monte_carlo.standard_normal_draws y run_sampling_report).
+    volatility: "static" (cov histórica constante), "garch" o "ewma": en
+    los dos últimos se simula con la trayectoria de covarianza condicional
+    de volatility.covariance_path (una matriz por mes). None usa
+    monte_carlo.MC_VOLATILITY, el mismo modelo que las vistas de la app.
+    Las bandas del fan chart (cuantiles por mes sobre todas las
+    simulaciones) se guardan en output/monte_carlo_bands.npz y los finales
+    ordenados en output/monte_carlo_finals.npy (la app los abre con mmap),
+    junto con su resumen compacto (summarize_finals) en
+    output/monte_carlo_summary.npz.
     Retorna dict con métricas y DataFrame de simulaciones.
     """
-    monthly_returns = prices.pct_change().dropna()
-    mu = monthly_returns.mean().values          # vector de medias
-    cov = monthly_returns.cov().values          # matriz de covarianza
-
-    # Inversión inicial unitaria por ticker
-    n_assets = len(prices.columns)
-    weights = np.ones(n_assets) / n_assets
-
-    portfolio_finals = []
-    path_records = []
-
-    np.random.seed(42)
-    for sim in range(n_simulations):
-        cumulative = 1.0
-        path = [1.0]
-        for _ in range(n_months):
-            # Retornos correlacionados mediante Cholesky
-            sample = np.random.multivariate_normal(mu, cov)
-            portfolio_return = weights @ sample
-            cumulative *= (1 + portfolio_return)
-            path.append(round(cumulative, 6))
-        portfolio_finals.append(cumulative)
-        if sim < 500:  # guardar primeras 500 trayectorias para fan chart
-            path_records.append(path)
-
-    finals = np.array(portfolio_finals)
-
-    # Métricas de riesgo
-    var_95 = float(np.percentile(finals, 5))          # VaR 95%
-    cvar = float(finals[finals <= var_95].mean())     # CVaR
-    p5  = float(np.percentile(finals, 5))
-    p50 = float(np.median(finals))
-    p95 = float(np.percentile(finals, 95))
-    pct_positive = float((finals > 1.0).mean() * 100)
-
-    metrics = {
-        "var_95":       round(var_95 - 1, 4),
-        "cvar":         round(cvar - 1, 4),
-        "worst_case":   round(p5 - 1, 4),
-        "base_case":    round(p50 - 1, 4),
-        "best_case":    round(p95 - 1, 4),
-        "pct_positive": round(pct_positive, 2),
-        "n_simulations": n_simulations,
-    }
+    from monte_carlo import (
+        MC_VOLATILITY, PathStore, path_quantiles, resolve_workers, risk_metrics, save_bands,
+        save_finals, save_summary, simulate_parallel, simulate_portfolio_paths, simulate_streaming,
+        simulation_inputs, summarize_accumulator, summarize_finals,
+    )
+
+    volatility = volatility or MC_VOLATILITY
+    mu, cov, weights, fit = simulation_inputs(prices, n_months, volatility)
+    if fit is not None:
+        vol_now = np.sqrt(np.diagonal(cov[0]))
+        vol_long = np.sqrt(fit["var_target"])
+        detail = (f", persistencia α+β={np.round(fit['persistence'], 3).tolist()}, "
+                  f"varianza constante (óptimo en la cota)={fit['boundary'].tolist()}"
+                  if volatility == "garch" else "")
+        _log(f"[OK] Volatilidad {volatility}: vol próxima={np.round(vol_now, 4).tolist()} "
+             f"vs histórica={np.round(vol_long, 4).tolist()}{detail}")
+
+    # Trayectorias para fan chart (con el punto inicial 1.0)
+    store = PathStore.create(min(n_paths, n_simulations), n_months + 1, kind=path_store)
+
+    report = None
+    if chunk_size:
+        streamed = simulate_streaming(
+            mu, cov, weights, n_simulations, n_months, chunk_size,
+            seed=seed, n_workers=n_workers, store=store, sampling=sampling,
+        )
+        finals = streamed["sample_finals"]
+        metrics = streamed["accumulator"].metrics()
+        summary = summarize_accumulator(streamed["accumulator"])
+        bands = streamed["bands"].quantiles()
+        report = streamed["sketch_report"]
+        _log(f"[QA] Sketch streaming: error relativo <= {report['rel_error_bound']:.2%}, "
+             f"máx. diferencia vs exacto={report['max_abs_diff']:.4%} "
+             f"(muestra de {report['sample_size']} sims).")
+    elif resolve_workers(n_workers) > 1:
+        parallel = simulate_parallel(
+            mu, cov, weights, n_simulations, n_months,
+            seed=seed, n_workers=n_workers, store=store, sampling=sampling,
+        )
+        finals = parallel["finals"]
+        bands = parallel["bands"].quantiles()
+        metrics = risk_metrics(finals)
+        summary = summarize_finals(finals)
+    else:
+        rng = np.random.default_rng(seed)
+        paths = simulate_portfolio_paths(
+            mu, cov, weights, n_simulations, n_months, rng, sampling
+        )
+        finals = paths[:, -1]
+        store.write(0, paths)
+        bands = path_quantiles(paths)
+        metrics = risk_metrics(finals)
+        summary = summarize_finals(finals)
+    store.publish()
+
+    # Bandas P5/P25/P50/P75/P95 por mes sobre todas las trayectorias
+    save_bands(bands)
+    _log(f"[QA] monte_carlo_bands.npz: {bands.shape[0]} cuantiles × {bands.shape[1] + 1} meses.")
+
     _log(f"[OK] Monte Carlo: VaR95={metrics['var_95']:.2%}, CVaR={metrics['cvar']:.2%}, "
          f"P50={metrics['base_case']:.2%}, P95={metrics['best_case']:.2%}, "
          f"%Positivas={metrics['pct_positive']:.1f}%")
@@ -217,24 +578,109 @@ def run_monte_carlo(prices: pd.DataFrame, n_simulations: int = 5000, n_months: i
         "final_value": finals,
         "return_pct": (finals - 1) * 100
     })
-    df_mc.to_csv("output/monte_carlo_results.csv", index=False)
-    _log(f"[QA] monte_carlo_results.csv: {len(df_mc)} filas.")
+    from artifacts import write_artifact
+
+    path = write_artifact(df_mc, "monte_carlo_results")
+    _log(f"[QA] {path}: {len(df_mc)} filas.")
+    path = save_finals(finals)
+    _log(f"[QA] {path}: {len(finals)} finales ordenados (mmap).")
+    path = save_summary(summary)
+    _log(f"[QA] {path}: histograma {len(summary['counts'])} bins, "
+         f"{len(summary['quantiles'])} cuantiles, colas {summary['tail_levels'].tolist()}.")
 
     return {
         "metrics": metrics,
         "finals": finals,
-        "paths": path_records,
+        "paths": store.array,
+        "path_store": store,
+        "bands": bands,
         "tickers": list(prices.columns),
+        "sketch_report": report,
     }
 
 
+def run_sampling_report(prices: pd.DataFrame, n_simulations: int = 4096,
+                        n_months: int = 12, n_replications: int = 20) -> pd.DataFrame:
+    """
+    Compara estrategias de muestreo (pseudo, antitético, Sobol, Halton):
+    error estándar de VaR/CVaR/media por unidad de tiempo de CPU, con el
+    mismo modelo de covarianza que run_monte_carlo (MC_VOLATILITY).
+    Exporta output/mc_sampling_report.csv.
+    """
+    from monte_carlo import MC_VOLATILITY, compare_sampling, simulation_inputs
+
+    mu, cov, weights, _ = simulation_inputs(prices, n_months, MC_VOLATILITY)
+    report = compare_sampling(
+        mu, cov, weights, n_simulations=n_simulations,
+        n_months=n_months, n_replications=n_replications,
+    )
+    os.makedirs("output", exist_ok=True)
+    report.to_csv("output/mc_sampling_report.csv", index=False)
+    _log(f"[OK] Reporte de muestreo Monte Carlo:\n{report.to_string(index=False)}")
+    return report
+
+
+def run_stress_scenarios(prices: pd.DataFrame, scenarios: Optional[list] = None,
+                         n_simulations: int = 5000, n_months: int = 12,
+                         seed: int = 42, n_workers: int = -1) -> pd.DataFrame:
+    """
+    Escenarios what-if (correlación → 1, volatilidad ×2, shocks de drift...)
+    sobre los mismos shocks del Monte Carlo, en paralelo y sin re-leer
+    precios ni reescribir monte_carlo_results.csv.
+    scenarios: lista de (nombre, transform(mu, cov) → (mu, cov)); por
+    defecto risk.DEFAULT_SCENARIOS. El escenario base usa la misma
+    covarianza que run_monte_carlo (MC_VOLATILITY); con una trayectoria
+    GARCH/EWMA las transformaciones se aplican mes a mes.
+    Exporta output/stress_scenarios.csv.
+    """
+    from monte_carlo import MC_VOLATILITY, simulation_inputs
+    from risk import DEFAULT_SCENARIOS, stress_test
+
+    # mu/pesos/covarianza de run_monte_carlo, indexados por ticker
+    mu, cov, weights, _ = simulation_inputs(prices, n_months, MC_VOLATILITY)
+    tickers = list(prices.columns)
+
+    df_stress = stress_test(
+        pd.Series(mu, index=tickers),
+        pd.DataFrame(cov, index=tickers, columns=tickers) if cov.ndim == 2 else cov, weights,
+        DEFAULT_SCENARIOS if scenarios is None else scenarios,
+        n_simulations=n_simulations, n_months=n_months, seed=seed, n_workers=n_workers,
+    )
+    os.makedirs("output", exist_ok=True)
+    df_stress.to_csv("output/stress_scenarios.csv", index=False)
+    _log(f"[QA] stress_scenarios.csv: {len(df_stress)} escenarios.\n"
+         f"{df_stress[['scenario', 'var_95', 'cvar', 'delta_var_95']].to_string(index=False)}")
+    return df_stress
+
+
+def run_backtest(prices: pd.DataFrame, backend: str = "pmdarima", horizon: int = 12,
+                 min_train: int = 36, n_workers: int = -1) -> pd.DataFrame:
+    """
+    Backtest rolling-origin del forecaster (ver backtest.py): MAPE y
+    cobertura de las bandas 80/95% por origen, con caché de orígenes ya
+    evaluados. Exporta output/arima_backtest.csv (resumen por ticker).
+    """
+    from backtest import backtest_summary, rolling_backtest
+
+    results = rolling_backtest(prices, backend=backend, horizon=horizon,
+                               min_train=min_train, n_workers=n_workers)
+    summary = backtest_summary(results)
+    os.makedirs("output", exist_ok=True)
+    summary.to_csv("output/arima_backtest.csv", index=False)
+    _log(f"[QA] arima_backtest.csv ({backend}):\n{summary.to_string(index=False)}")
+    return results
+
+
 # ─────────────────────────────────────────────────────────────
 # PIPELINE PRINCIPAL
 # ─────────────────────────────────────────────────────────────
-def run_financial_pipeline(n_simulations: int = 5000) -> dict:
+def run_financial_pipeline(n_simulations: int = 5000, interval: str = "1mo",
+                           model_freq: str = "MS") -> dict:
     """
     Ejecuta el pipeline completo:
       load_financial_data → run_arima_forecast → run_monte_carlo
+    Con interval diario/intradía los modelos corren sobre los precios
+    remuestreados a model_freq (mensual por defecto).
     Retorna dict con todos los resultados para uso en Streamlit.
     """
     _log("=" * 60)
@@ -242,16 +688,19 @@ def run_financial_pipeline(n_simulations: int = 5000) -> dict:
     _log("=" * 60)
 
     # 1. Cargar precios
-    prices = load_financial_data()
-    os.makedirs("output", exist_ok=True)
-    prices.to_csv("output/financial_clean.csv")
-    _log(f"[OK] financial_clean.csv guardado: {prices.shape}")
+    prices = load_financial_data(interval, model_freq)
+    from artifacts import write_artifact
 
-    # 2. ARIMA
-    arima_df = run_arima_forecast(prices)
+    path = write_artifact(prices, "financial_clean", index=True)
+    _log(f"[OK] financial_clean guardado: {prices.shape} → {path}")
+
+    # 2. ARIMA (con caché de modelos entre ejecuciones)
+    arima_df = run_arima_forecast(prices, use_cache=True)
 
     # 3. Monte Carlo
-    mc_results = run_monte_carlo(prices, n_simulations=n_simulations)
+    mc_results = run_monte_carlo(
+        prices, n_simulations=n_simulations, n_paths=2000, path_store="memmap",
+    )
 
     # 4. Retornos históricos mensuales para correlación
     monthly_returns = prices.pct_change().dropna()
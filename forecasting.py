@@ -0,0 +1,378 @@
+# forecasting.py — Utilidades comunes de forecast: bandas de confianza
+"""
+Bandas de confianza de un forecast gaussiano a partir de la media y del
+error estándar por horizonte:
+  1. Un solo cálculo del modelo (forecast puntual + SE)
+  2. Cualquier lista de niveles (50/80/90/95/99) se deriva vectorizada:
+     media ± z · SE, con z = Φ⁻¹((1 + nivel) / 2)
+  3. El DataFrame de salida se arma por columnas, no fila a fila
+  4. Screening de estacionariedad (ADF + KPSS) de todos los tickers en lote
+     sobre una matriz (tiempo × tickers), que fija d antes de auto_arima
+  5. Backends de forecast intercambiables; "ar" es un AR(p) nativo por
+     mínimos cuadrados, en lote y sin pmdarima/statsmodels, para refrescos
+     rápidos (la búsqueda auto_arima completa queda para la corrida nocturna)
+
+Usado por financial_pipeline.run_arima_forecast.
+"""
+
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+CI_LEVELS = (80, 95)
+
+
+def z_scores(levels) -> np.ndarray:
+    """Cuantil normal bilateral de cada nivel (en %)."""
+    return np.array([NormalDist().inv_cdf(0.5 + level / 200) for level in levels])
+
+
+def band_columns(levels=CI_LEVELS) -> list:
+    """Nombres lower_<nivel>, upper_<nivel> en el orden de `levels`."""
+    return [f"{side}_{level:g}" for level in levels for side in ("lower", "upper")]
+
+
+def se_from_interval(lower, upper, level: float = 95) -> np.ndarray:
+    """Error estándar implícito en un intervalo simétrico al `level`%."""
+    return (np.asarray(upper, dtype=float) - np.asarray(lower, dtype=float)) / (2 * z_scores([level])[0])
+
+
+def confidence_bands(mean, se, levels=CI_LEVELS) -> tuple:
+    """
+    Matrices (horizonte × niveles) lower y upper en una sola operación.
+    """
+    mean = np.asarray(mean, dtype=float)[:, None]
+    half = np.asarray(se, dtype=float)[:, None] * z_scores(levels)[None, :]
+    return mean - half, mean + half
+
+
+def forecast_frame(ticker: str, dates, mean, se, levels=CI_LEVELS,
+                   decimals: int = 4) -> pd.DataFrame:
+    """
+    Formato largo: ticker, date, forecast, lower_<n>, upper_<n> por nivel.
+    """
+    lower, upper = confidence_bands(mean, se, levels)
+    columns = {
+        "ticker":   np.full(len(dates), ticker, dtype=object),
+        "date":     dates,
+        "forecast": np.round(np.asarray(mean, dtype=float), decimals),
+    }
+    for j, level in enumerate(levels):
+        columns[f"lower_{level:g}"] = np.round(lower[:, j], decimals)
+        columns[f"upper_{level:g}"] = np.round(upper[:, j], decimals)
+    return pd.DataFrame(columns)
+
+
+# ─────────────────────────────────────────────────────────────
+# SCREENING DE ESTACIONARIEDAD EN LOTE
+# ─────────────────────────────────────────────────────────────
+# ADF (regresión con constante, autolag AIC) y KPSS (nivel) para todos los
+# tickers a la vez sobre una matriz (tiempo × tickers). Las diferencias y
+# la matriz de rezagos se calculan una sola vez y se reutilizan para
+# todas las longitudes de rezago candidatas (una sola matriz de Gram).
+KPSS_CRIT_5 = 0.463
+# Valor crítico ADF 5% de MacKinnon (2010), regresión con constante, N=1:
+# b0 + b1/T + b2/T² + b3/T³
+ADF_CRIT_5 = (-2.86154, -2.8903, -4.234, -40.04)
+
+
+def adf_critical_5(nobs) -> np.ndarray:
+    return np.polyval(ADF_CRIT_5[::-1], 1 / np.asarray(nobs, dtype=float))
+
+
+def adf_max_lag(n_obs: int) -> int:
+    """Regla de Schwert (default de statsmodels.adfuller con regression='c')."""
+    return max(0, min(n_obs // 2 - 2, int(np.ceil(12.0 * (n_obs / 100.0) ** 0.25))))
+
+
+def lag_tensor(x: np.ndarray, n_lags: int) -> np.ndarray:
+    """
+    Rezagos de x (filas × n_lags × tickers): la fila r tiene
+    x[t-1], ..., x[t-n_lags] con t = r + n_lags, alineada con el objetivo
+    x[n_lags:]. Vista sin copia.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(x[:-1], n_lags, axis=0) \
+        if n_lags else np.empty((len(x) - n_lags, x.shape[1], 0))
+    # sliding_window_view → (filas, tickers, n_lags) en orden cronológico
+    return windows[..., ::-1].transpose(0, 2, 1)
+
+
+def _adf_design(levels: np.ndarray, diffs: np.ndarray, n_lags: int, used: int):
+    """
+    Regresión ADF sobre las últimas T-1-n_lags observaciones:
+    Δy_t ~ [1, y_{t-1}, Δy_{t-1..t-used}]. Retorna (X, y) con tickers al final.
+    """
+    n = len(diffs) - n_lags
+    k = diffs.shape[1]
+    lags = lag_tensor(diffs, n_lags)[:, :used] if used else np.empty((n, 0, k))
+    X = np.concatenate([
+        np.ones((n, 1, k)),
+        levels[n_lags:-1][:, None, :],
+        lags,
+    ], axis=1)
+    return X, diffs[n_lags:]
+
+
+def _gram_fit(X: np.ndarray, y: np.ndarray, n_cols: int) -> tuple:
+    """
+    MCO por lotes con las primeras n_cols columnas de X (filas × cols × tickers).
+    Retorna (beta, ssr, inv) con inv = (X'X)⁻¹ por ticker.
+    """
+    Xc = X[:, :n_cols]
+    G = np.einsum("nik,njk->kij", Xc, Xc)
+    b = np.einsum("nik,nk->ki", Xc, y)
+    inv = np.linalg.inv(G)
+    beta = np.einsum("kij,kj->ki", inv, b)
+    ssr = np.einsum("nk,nk->k", y, y) - np.einsum("ki,ki->k", beta, b)
+    return beta, np.maximum(ssr, 1e-300), inv
+
+
+def batch_adf(values: np.ndarray, max_lag: Optional[int] = None, pvalues: bool = True) -> dict:
+    """
+    ADF con constante y autolag AIC para cada columna de `values`
+    (tiempo × tickers, sin NaN). Mismo procedimiento que statsmodels.adfuller:
+    AIC comparado sobre una muestra común, re-estimación con el rezago
+    elegido y p-valor de MacKinnon.
+    Retorna arrays por ticker: stat, pvalue, crit_5, used_lag, nobs.
+    Con pvalues=False no importa statsmodels y pvalue es None.
+    """
+    levels = np.asarray(values, dtype=float)
+    diffs = np.diff(levels, axis=0)
+    max_lag = adf_max_lag(len(levels)) if max_lag is None else max_lag
+
+    # 1) Selección de rezago: una Gram con todos los rezagos, resuelta por prefijos
+    X, y = _adf_design(levels, diffs, max_lag, max_lag)
+    n = len(y)
+    G = np.einsum("nik,njk->kij", X, X)
+    b = np.einsum("nik,nk->ki", X, y)
+    yy = np.einsum("nk,nk->k", y, y)
+    aic = np.empty((max_lag + 1, levels.shape[1]))
+    for lag in range(max_lag + 1):
+        m = lag + 2
+        beta = np.linalg.solve(G[:, :m, :m], b[:, :m, None])[..., 0]
+        ssr = np.maximum(yy - np.einsum("ki,ki->k", beta, b[:, :m]), 1e-300)
+        aic[lag] = n * (np.log(2 * np.pi) + np.log(ssr / n) + 1) + 2 * m
+    used_lag = aic.argmin(axis=0)
+
+    # 2) Re-estimación con el rezago elegido (por grupos de igual rezago)
+    stat = np.empty(levels.shape[1])
+    nobs = np.empty(levels.shape[1], dtype=int)
+    for lag in np.unique(used_lag):
+        cols = np.flatnonzero(used_lag == lag)
+        X, y = _adf_design(levels[:, cols], diffs[:, cols], int(lag), int(lag))
+        beta, ssr, inv = _gram_fit(X, y, int(lag) + 2)
+        sigma2 = ssr / (len(y) - (lag + 2))
+        stat[cols] = beta[:, 1] / np.sqrt(sigma2 * inv[:, 1, 1])
+        nobs[cols] = len(y)
+
+    pvalue = None
+    if pvalues:
+        from statsmodels.tsa.adfvalues import mackinnonp
+
+        pvalue = np.array([mackinnonp(s, regression="c", N=1) for s in stat])
+    return {"stat": stat, "pvalue": pvalue, "crit_5": adf_critical_5(nobs),
+            "used_lag": used_lag, "nobs": nobs}
+
+
+def batch_kpss(values: np.ndarray) -> np.ndarray:
+    """
+    Estadístico KPSS de estacionariedad en nivel para cada columna, con el
+    ancho de banda automático de Hobijn et al. (default de statsmodels.kpss).
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    resid = x - x.mean(axis=0)
+    eta = (np.cumsum(resid, axis=0) ** 2).sum(axis=0) / n ** 2
+
+    def autocov(max_lag):
+        # (max_lag + 1) × tickers: Σ e_t e_{t-i} para i = 0..max_lag
+        return np.stack([(resid[i:] * resid[:n - i]).sum(axis=0) for i in range(max_lag + 1)])
+
+    # Ancho de banda automático (Hobijn, Franses & Ooms 2004)
+    cov_lags = int(n ** (2 / 9))
+    ac = autocov(cov_lags) / n
+    i = np.arange(1, cov_lags + 1)[:, None]
+    s0 = ac[0] + 2 * ac[1:].sum(axis=0)
+    s1 = 2 * (i * ac[1:]).sum(axis=0)
+    gamma = 1.1447 * ((s1 / s0) ** 2) ** (1 / 3)
+    bandwidth = np.minimum((gamma * n ** (1 / 3)).astype(int), n - 1)
+
+    # Varianza de largo plazo Newey-West con pesos de Bartlett por ticker
+    ac = autocov(int(bandwidth.max()))
+    lag = np.arange(ac.shape[0])[:, None]
+    weights = np.where((lag >= 1) & (lag <= bandwidth), 2 * (1 - lag / (bandwidth + 1)), 0.0)
+    weights[0] = 1.0
+    s_hat = (weights * ac).sum(axis=0) / n
+    return eta / s_hat
+
+
+def aligned_blocks(prices: pd.DataFrame, min_obs: int = 12):
+    """
+    Agrupa los tickers con la misma ventana de datos para procesarlos en
+    lote. Genera (tickers, índice de fechas, valores tiempo × tickers).
+    """
+    windows = {}
+    for ticker in prices.columns:
+        series = prices[ticker].dropna()
+        if len(series) < min_obs:
+            continue
+        windows.setdefault((series.index[0], series.index[-1], len(series)), []).append(ticker)
+
+    for (first, last, _), tickers in windows.items():
+        block = prices.loc[first:last, tickers]
+        if block.isna().any().any():            # huecos internos: ventana propia
+            block = block.dropna()
+        yield tickers, block.index, block.to_numpy(dtype=float)
+
+
+def screen_stationarity(prices: pd.DataFrame, alpha: float = 0.05,
+                        pvalues: bool = True) -> pd.DataFrame:
+    """
+    Pre-screening de todos los tickers: ADF + KPSS en lote y d ∈ {0, 1}
+    con la misma regla que el ajuste individual (d = 0 si ADF rechaza raíz
+    unitaria). Los tickers con la misma ventana de datos se procesan juntos.
+    Con pvalues=False la decisión usa el valor crítico 5% de MacKinnon
+    (sin statsmodels).
+    Retorna la tabla por ticker (estadísticos, d y acuerdo ADF/KPSS).
+    """
+    rows = []
+    for tickers, _, values in aligned_blocks(prices):
+        adf = batch_adf(values, pvalues=pvalues)
+        kpss = batch_kpss(values)
+        for j, ticker in enumerate(tickers):
+            if pvalues:
+                d = 0 if adf["pvalue"][j] < alpha else 1
+            else:
+                d = 0 if adf["stat"][j] < adf["crit_5"][j] else 1
+            rows.append({
+                "ticker":     ticker,
+                "adf_stat":   round(float(adf["stat"][j]), 4),
+                "adf_pvalue": round(float(adf["pvalue"][j]), 4) if pvalues else np.nan,
+                "used_lag":   int(adf["used_lag"][j]),
+                "kpss_stat":  round(float(kpss[j]), 4),
+                "kpss_reject": bool(kpss[j] > KPSS_CRIT_5),
+                "d":          d,
+                "agree":      (d == 0) != bool(kpss[j] > KPSS_CRIT_5),
+            })
+
+    if not rows:
+        return pd.DataFrame()
+    table = pd.DataFrame(rows).set_index("ticker")
+    return table.loc[[t for t in prices.columns if t in table.index]]
+
+
+def future_dates(index: pd.DatetimeIndex, n_forecast: int) -> pd.DatetimeIndex:
+    """
+    Fechas de los n_forecast períodos siguientes en la frecuencia del
+    índice (mensual "MS", días hábiles, horas...).
+    """
+    from price_store import infer_freq
+
+    offset = infer_freq(pd.DatetimeIndex(index))
+    return pd.date_range(start=index[-1] + offset, periods=n_forecast, freq=offset)
+
+
+# ─────────────────────────────────────────────────────────────
+# BACKENDS DE FORECAST
+# ─────────────────────────────────────────────────────────────
+# Cada backend recibe (prices, n_forecast, levels) y retorna el formato
+# largo de forecast_frame para todos los tickers. "pmdarima" (búsqueda
+# auto_arima completa, con caché y pool de procesos) vive en
+# financial_pipeline.run_arima_forecast; acá se registran los nativos.
+FORECAST_BACKENDS = {}
+
+
+def register_backend(name: str):
+    def decorator(fn):
+        FORECAST_BACKENDS[name] = fn
+        return fn
+    return decorator
+
+
+def fit_ar_batch(z: np.ndarray, max_p: int = 3) -> dict:
+    """
+    AR(p) con constante por mínimos cuadrados para cada columna de z
+    (tiempo × tickers), p ∈ 0..max_p elegido por AIC sobre una muestra
+    común. Todas las órdenes salen de prefijos de una sola Gram por ticker.
+    Retorna coef (tickers × (1 + max_p), [c, φ1..φmax_p] con ceros más allá
+    de p), sigma2 y p por ticker.
+    """
+    n_rows, k = z.shape
+    max_p = max(0, min(max_p, n_rows // 3))
+    X = np.concatenate([np.ones((n_rows - max_p, 1, k)), lag_tensor(z, max_p)], axis=1)
+    y = z[max_p:]
+    n = len(y)
+    G = np.einsum("nik,njk->kij", X, X)
+    b = np.einsum("nik,nk->ki", X, y)
+    yy = np.einsum("nk,nk->k", y, y)
+
+    coef = np.zeros((max_p + 1, k, max_p + 1))
+    ssr = np.empty((max_p + 1, k))
+    for p in range(max_p + 1):
+        m = p + 1
+        coef[p, :, :m] = np.linalg.solve(G[:, :m, :m], b[:, :m, None])[..., 0]
+        ssr[p] = np.maximum(yy - np.einsum("ki,ki->k", coef[p, :, :m], b[:, :m]), 1e-300)
+    aic = n * np.log(ssr / n) + 2 * (np.arange(max_p + 1)[:, None] + 1)
+    order = aic.argmin(axis=0)
+    cols = np.arange(k)
+    return {
+        "coef":   coef[order, cols],
+        "sigma2": ssr[order, cols] / np.maximum(n - order - 1, 1),
+        "p":      order,
+    }
+
+
+def ar_forecast_batch(z: np.ndarray, fit: dict, n_forecast: int) -> tuple:
+    """
+    Forecast recursivo h pasos para todos los tickers a la vez y error
+    estándar cerrado: Var(e_h) = σ² Σ_{j<h} ψ_j², con ψ los pesos MA(∞)
+    del AR. Retorna (media, ψ) de forma (horizonte × tickers).
+    """
+    coef = fit["coef"]
+    c, phi = coef[:, 0], coef[:, 1:]
+    max_p = phi.shape[1]
+    history = list(z[len(z) - max_p:][::-1]) if max_p else []     # z[t-1], z[t-2], ...
+
+    mean = np.empty((n_forecast, z.shape[1]))
+    psi = np.zeros((n_forecast, z.shape[1]))
+    psi[0] = 1.0
+    for h in range(n_forecast):
+        mean[h] = c + sum(phi[:, i] * history[i] for i in range(max_p))
+        history = [mean[h]] + history[:-1] if max_p else history
+        if h:
+            psi[h] = sum(phi[:, i] * psi[h - 1 - i] for i in range(min(h, max_p)))
+    return mean, psi
+
+
+@register_backend("ar")
+def ar_forecast(prices: pd.DataFrame, n_forecast: int = 12, levels=CI_LEVELS,
+                max_p: int = 3) -> pd.DataFrame:
+    """
+    Backend nativo rápido: d por screening ADF en lote (sin statsmodels),
+    AR(p) por mínimos cuadrados sobre el nivel (d=0) o las diferencias
+    (d=1), todo vectorizado por bloque de tickers. Para d=1 el forecast de
+    nivel integra las diferencias y los ψ se acumulan.
+    Mismo esquema de salida que run_arima_forecast.
+    """
+    screen = screen_stationarity(prices, pvalues=False)
+    frames = {}
+    for tickers, index, values in aligned_blocks(prices):
+        d = screen.loc[tickers, "d"].to_numpy()
+        z = np.where(d == 1, np.diff(values, axis=0), values[1:])
+        fit = fit_ar_batch(z, max_p)
+        mean, psi = ar_forecast_batch(z, fit, n_forecast)
+
+        integrated = d == 1
+        mean[:, integrated] = values[-1, integrated] + np.cumsum(mean[:, integrated], axis=0)
+        psi[:, integrated] = np.cumsum(psi[:, integrated], axis=0)
+        se = np.sqrt(fit["sigma2"] * np.cumsum(psi ** 2, axis=0))
+
+        dates = future_dates(index, n_forecast)
+        for j, ticker in enumerate(tickers):
+            frames[ticker] = forecast_frame(ticker, dates, mean[:, j], se[:, j], levels)
+
+    ordered = [frames[t] for t in prices.columns if t in frames]
+    return pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame(
+        columns=["ticker", "date", "forecast"] + band_columns(levels))
@@ -1,19 +1,20 @@
 # hr_pipeline.py — People Analytics Pipeline
 """
 Pipeline HR Analytics con dataset IBM Watson HR Attrition:
-  1. Carga y QA del dataset
+  1. Carga por bloques con esquema de dtypes explícito y QA incremental
   2. Análisis de attrition (Logistic Regression + correlaciones)
   3. Análisis de brecha salarial (prueba t)
   4. Análisis de diversidad
 
 Exporta:
-  output/hr_clean.csv
+  output/hr_clean.{parquet,csv} (artifacts.py)
 """
 
 import os
 import datetime
 import traceback
 import warnings
+from typing import Optional
 warnings.filterwarnings("ignore")
 
 import numpy as np
@@ -35,19 +36,98 @@ def _log(msg: str):
 # ─────────────────────────────────────────────────────────────
 # STEP 1: CARGA Y QA
 # ─────────────────────────────────────────────────────────────
-def load_hr_data() -> pd.DataFrame:
-    df = pd.read_csv(DATA_PATH)
-    _log(f"[OK] Dataset cargado: {df.shape[0]} filas × {df.shape[1]} columnas.")
-
-    # QA inmediato
-    nulls = df.isnull().sum().sum()
-    _log(f"[QA] Nulos totales: {nulls}")
-
-    attrition_vc = df["Attrition"].value_counts().to_dict()
-    _log(f"[QA] Attrition distribution: {attrition_vc}")
+# Esquema explícito del extracto HRIS: categóricas para los textos de baja
+# cardinalidad, enteros pequeños para escalas ordinales y conteos
+HR_CATEGORICAL = [
+    "Attrition", "BusinessTravel", "Department", "EducationField", "Gender",
+    "JobRole", "MaritalStatus", "Over18", "OverTime",
+]
+HR_ORDINAL = [
+    "Education", "EnvironmentSatisfaction", "JobInvolvement", "JobLevel",
+    "JobSatisfaction", "PerformanceRating", "RelationshipSatisfaction",
+    "StockOptionLevel", "WorkLifeBalance",
+]
+HR_DTYPES = {
+    **{c: "category" for c in HR_CATEGORICAL},
+    **{c: "int8" for c in HR_ORDINAL},
+    "Age": "int8", "DistanceFromHome": "int8", "NumCompaniesWorked": "int8",
+    "TotalWorkingYears": "int8", "TrainingTimesLastYear": "int8", "YearsAtCompany": "int8",
+    "YearsInCurrentRole": "int8", "YearsSinceLastPromotion": "int8", "YearsWithCurrManager": "int8",
+    "PercentSalaryHike": "int8", "EmployeeCount": "int8", "StandardHours": "int16",
+    "DailyRate": "int16", "HourlyRate": "int16", "EmployeeNumber": "int32",
+    "MonthlyIncome": "int32", "MonthlyRate": "int32",
+}
+# Columnas que usan los análisis de este módulo (proyección opcional)
+HR_ANALYSIS_COLUMNS = [
+    "Attrition", "Age", "Department", "Gender", "JobLevel", "MonthlyIncome",
+    "OverTime", "TotalWorkingYears", "YearsAtCompany", "JobSatisfaction",
+    "EnvironmentSatisfaction", "DistanceFromHome", "NumCompaniesWorked",
+    "YearsInCurrentRole", "YearsSinceLastPromotion", "WorkLifeBalance",
+    "PerformanceRating",
+]
+HR_CHUNKSIZE = 200_000
+
+
+def _chunk_qa(chunk: pd.DataFrame, qa: dict) -> None:
+    """Acumula en `qa` los chequeos de un bloque: filas, nulos por columna, attrition, ordinales fuera de 1..5."""
+    qa["rows"] += len(chunk)
+    qa["nulls"] = qa["nulls"].add(chunk.isnull().sum(), fill_value=0)
+    if "Attrition" in chunk.columns:
+        qa["attrition"] = qa["attrition"].add(chunk["Attrition"].value_counts(), fill_value=0)
+    for col in [c for c in HR_ORDINAL if c in chunk.columns and c != "StockOptionLevel"]:
+        out = int(((chunk[col] < 1) | (chunk[col] > 5)).sum())
+        if out:
+            qa["out_of_range"][col] = qa["out_of_range"].get(col, 0) + out
+
+
+def load_hr_data(path: str = DATA_PATH, columns: Optional[list] = None,
+                 chunksize: int = HR_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Lee el extracto HR por bloques de `chunksize` filas con el esquema
+    HR_DTYPES (sólo `columns` si se indica, p.ej. HR_ANALYSIS_COLUMNS) y
+    corre el QA sobre cada bloque a medida que llega. Los enteros se leen
+    nullable y quedan en el dtype pequeño si la columna no tiene nulos;
+    las categóricas de los bloques se unen con union_categoricals.
+    """
+    from pandas.api.types import union_categoricals
+
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = list(header) if columns is None else [c for c in header if c in columns]
+    dtypes = {c: (t.capitalize() if t.startswith("int") else t)
+              for c, t in HR_DTYPES.items() if c in usecols}
+
+    qa = {"rows": 0, "nulls": pd.Series(dtype=float), "attrition": pd.Series(dtype=float),
+          "out_of_range": {}}
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        _chunk_qa(chunk, qa)
+        chunks.append(chunk)
+
+    if len(chunks) == 1:
+        df = chunks[0]
+    else:
+        categorical = [c for c in usecols if dtypes.get(c) == "category"]
+        merged = {c: union_categoricals([ch[c] for ch in chunks]) for c in categorical}
+        df = pd.concat([ch.drop(columns=categorical) for ch in chunks], ignore_index=True)
+        for c in categorical:
+            df[c] = merged[c]
+        df = df[usecols]
+    for col, dtype in HR_DTYPES.items():
+        if col in df.columns and dtype.startswith("int") and not qa["nulls"].get(col, 0):
+            df[col] = df[col].astype(dtype)
+
+    _log(f"[OK] Dataset cargado: {df.shape[0]} filas × {df.shape[1]} columnas "
+         f"({len(chunks)} bloques, {df.memory_usage(deep=True).sum() / 1e6:.2f} MB).")
+
+    # QA acumulado por bloque
+    _log(f"[QA] Filas leídas: {qa['rows']} en {len(chunks)} bloques")
+    _log(f"[QA] Nulos totales: {int(qa['nulls'].sum())}")
+    _log(f"[QA] Attrition distribution: {qa['attrition'].astype(int).to_dict()}")
+    if qa["out_of_range"]:
+        _log(f"[WARN] Escalas ordinales fuera de 1..5: {qa['out_of_range']}")
 
     # Mapear Attrition a binario
-    df["Attrition_num"] = (df["Attrition"] == "Yes").astype(int)
+    df["Attrition_num"] = (df["Attrition"] == "Yes").astype("int8")
 
     # Columnas requeridas
     required = [
@@ -76,7 +156,7 @@ def analyze_attrition(df: pd.DataFrame) -> dict:
     _log(f"[OK] Tasa global de attrition: {global_rate:.1%}")
 
     # Por departamento
-    dept_rates = df.groupby("Department")["Attrition_num"].mean().reset_index()
+    dept_rates = df.groupby("Department", observed=True)["Attrition_num"].mean().reset_index()
     dept_rates.columns = ["Department", "Attrition_Rate"]
     dept_rates["Attrition_Rate_Pct"] = (dept_rates["Attrition_Rate"] * 100).round(1)
     _log(f"[OK] Attrition por dpto:\n{dept_rates.to_string(index=False)}")
@@ -152,7 +232,7 @@ def analyze_attrition(df: pd.DataFrame) -> dict:
 # ─────────────────────────────────────────────────────────────
 def analyze_pay_gap(df: pd.DataFrame) -> dict:
     # Salario promedio por género
-    gender_salary = df.groupby("Gender")["MonthlyIncome"].agg(["mean", "median", "std", "count"])
+    gender_salary = df.groupby("Gender", observed=True)["MonthlyIncome"].agg(["mean", "median", "std", "count"])
     _log(f"[OK] Salario por género:\n{gender_salary.to_string()}")
 
     m_sal = gender_salary.loc["Male", "mean"] if "Male" in gender_salary.index else np.nan
@@ -205,18 +285,18 @@ def analyze_pay_gap(df: pd.DataFrame) -> dict:
 # ─────────────────────────────────────────────────────────────
 def analyze_diversity(df: pd.DataFrame) -> dict:
     # Distribución género por departamento
-    gender_dept = df.groupby(["Department", "Gender"]).size().unstack(fill_value=0)
+    gender_dept = df.groupby(["Department", "Gender"], observed=True).size().unstack(fill_value=0)
     gender_dept_pct = gender_dept.div(gender_dept.sum(axis=1), axis=0) * 100
     _log(f"[OK] Distribución género por dpto:\n{gender_dept_pct.to_string()}")
 
     # Satisfacción por género
-    satisfaction_gender = df.groupby("Gender")[
+    satisfaction_gender = df.groupby("Gender", observed=True)[
         ["JobSatisfaction", "EnvironmentSatisfaction", "WorkLifeBalance"]
     ].mean().round(2)
     _log(f"[OK] Satisfacción por género:\n{satisfaction_gender.to_string()}")
 
     # Satisfacción por departamento (para heatmap)
-    satisfaction_dept = df.groupby("Department")[
+    satisfaction_dept = df.groupby("Department", observed=True)[
         ["JobSatisfaction", "EnvironmentSatisfaction", "WorkLifeBalance"]
     ].mean().round(2)
 
@@ -231,25 +311,28 @@ def analyze_diversity(df: pd.DataFrame) -> dict:
 # ─────────────────────────────────────────────────────────────
 # PIPELINE PRINCIPAL
 # ─────────────────────────────────────────────────────────────
-def run_hr_pipeline() -> dict:
+def run_hr_pipeline(columns: Optional[list] = None) -> dict:
     """
     Ejecuta el pipeline HR completo y retorna dict con todos
     los resultados para uso en Streamlit.
+    Con columns (p.ej. HR_ANALYSIS_COLUMNS) sólo se leen esas columnas del
+    extracto; hr_clean queda con la misma proyección.
     """
     _log("=" * 60)
     _log("INICIANDO PIPELINE HR ANALYTICS")
     _log("=" * 60)
 
-    df = load_hr_data()
+    df = load_hr_data(columns=columns)
 
     attrition_results = analyze_attrition(df)
     pay_gap_results   = analyze_pay_gap(df)
     diversity_results = analyze_diversity(df)
 
-    # Guardar CSV limpio
-    os.makedirs("output", exist_ok=True)
-    df.to_csv("output/hr_clean.csv", index=False)
-    _log(f"[OK] hr_clean.csv guardado: {df.shape}")
+    # Guardar dataset limpio (columnar + CSV)
+    from artifacts import write_artifact
+
+    path = write_artifact(df, "hr_clean")
+    _log(f"[OK] hr_clean guardado: {df.shape} → {path}")
 
     _log("PIPELINE HR COMPLETADO ✓")
     _log("=" * 60)
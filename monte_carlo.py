@@ -0,0 +1,1000 @@
+# monte_carlo.py — Motor Monte Carlo vectorizado del portfolio
+"""
+Motor de simulación Monte Carlo:
+  1. Factoriza la matriz de covarianza una sola vez (Cholesky)
+  2. Genera el tensor completo de shocks (simulaciones × meses × activos)
+     con numpy.random.Generator en una sola llamada
+  3. Calcula las trayectorias acumuladas con cumprod
+  4. Modo streaming: simula por bloques de tamaño fijo y acumula
+     (conteo > 1.0, sketch de cuantiles mergeable, sumas de cola)
+     con memoria constante
+  5. Modo paralelo: reparte bloques en un ProcessPoolExecutor, cada uno
+     con su propio stream (SeedSequence.spawn), y combina en orden
+  6. PathStore: buffer float32 preasignado para trayectorias (memoria,
+     multiprocessing.shared_memory o np.memmap en output/) que los
+     procesos y la app leen sin copiar
+  7. IncrementalMonteCarlo: conserva los finales ya simulados y sólo
+     simula los bloques que faltan cuando se piden más simulaciones
+  8. Reducción de varianza: muestreo cuasi-aleatorio (Sobol/Halton),
+     pares antitéticos y variable de control con la media analítica
+  9. Bandas del fan chart: cuantiles P5/P25/P50/P75/P95 por mes sobre
+     todas las trayectorias, guardados en output/monte_carlo_bands.npz
+ 10. Covarianza variable en el tiempo: cov de forma (meses × activos ×
+     activos), p.ej. la trayectoria GARCH/EWMA de volatility.py, con una
+     factorización de Cholesky en lote por mes
+ 11. Finales ordenados en output/monte_carlo_finals.npy: la app los abre
+     con mmap; cuantiles, CVaR e histogramas salen por índice y
+     searchsorted sobre el buffer mapeado, sin copiarlo
+ 12. Resumen compacto en output/monte_carlo_summary.npz (histograma con
+     bordes fijos, grilla densa de cuantiles, medias de cola): la pestaña
+     de riesgo lo dibuja con tamaño constante sin importar n_simulations
+
+Usado por financial_pipeline.run_monte_carlo y app.py.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+PATHS_FILE = "output/monte_carlo_paths.npy"
+FINALS_FILE = "output/monte_carlo_finals.npy"
+SUMMARY_FILE = "output/monte_carlo_summary.npz"
+TAIL_LEVELS = (0.01, 0.05, 0.10)
+BANDS_FILE = "output/monte_carlo_bands.npz"
+BAND_QUANTILES = (0.05, 0.25, 0.50, 0.75, 0.95)
+
+
+# ─────────────────────────────────────────────────────────────
+# FACTORIZACIÓN Y SIMULACIÓN
+# ─────────────────────────────────────────────────────────────
+# Modelo de covarianza del pipeline (run_monte_carlo) y de las vistas de la
+# app (motor incremental, frontera, portfolio_risk): ver simulation_inputs.
+# "static" por defecto: GARCH/EWMA sobre ~60 retornos mensuales son opt-in
+# (FIN_MC_VOLATILITY=garch|ewma)
+MC_VOLATILITY = os.environ.get("FIN_MC_VOLATILITY", "static")
+
+
+def portfolio_inputs(prices) -> tuple:
+    """mu y cov de los retornos mensuales + pesos del portfolio igualitario."""
+    monthly_returns = prices.pct_change().dropna()
+    mu = monthly_returns.mean().values          # vector de medias
+    cov = monthly_returns.cov().values          # matriz de covarianza
+
+    # Inversión inicial unitaria por ticker
+    n_assets = len(prices.columns)
+    weights = np.ones(n_assets) / n_assets
+    return mu, cov, weights
+
+
+def simulation_inputs(prices, n_months: int = 12, volatility: str = MC_VOLATILITY) -> tuple:
+    """
+    portfolio_inputs con la covarianza del modelo de volatilidad: "static"
+    (cov histórica, una matriz) o "garch"/"ewma" (trayectoria condicional de
+    volatility.covariance_path, una matriz por mes).
+    Retorna (mu, cov, weights, fit), fit=None con "static".
+    """
+    mu, cov, weights = portfolio_inputs(prices)
+    if volatility == "static":
+        return mu, cov, weights, None
+    from volatility import covariance_path
+
+    cov, fit = covariance_path(prices.pct_change().dropna().to_numpy(), n_months, volatility)
+    return mu, cov, weights, fit
+
+
+def covariance_factor(cov: np.ndarray) -> np.ndarray:
+    """
+    Factor L tal que L @ L.T == cov (también en lote: cov de forma
+    (meses × activos × activos) → un factor por mes).
+    Siempre Cholesky, para que escenarios con los mismos shocks (números
+    aleatorios comunes) usen la misma factorización: si la matriz es sólo
+    semidefinida (p.ej. activos perfectamente correlacionados) se suma a la
+    diagonal un jitter relativo creciente (1e-10 … 1e-4 de la varianza media).
+    """
+    cov = np.asarray(cov, dtype=float)
+    scale = np.diagonal(cov, axis1=-2, axis2=-1).mean(axis=-1)[..., None, None]
+    eye = np.eye(cov.shape[-1])
+    for jitter in (0.0, 1e-10, 1e-8, 1e-6):
+        try:
+            return np.linalg.cholesky(cov + jitter * scale * eye)
+        except np.linalg.LinAlgError:
+            pass
+    return np.linalg.cholesky(cov + 1e-4 * scale * eye)
+
+
+SAMPLING_STRATEGIES = ("pseudo", "antithetic", "sobol", "halton")
+
+
+def standard_normal_draws(n_simulations: int, n_months: int, n_assets: int,
+                          rng: np.random.Generator, sampling: str = "pseudo") -> np.ndarray:
+    """
+    Tensor de shocks N(0, 1) (simulaciones × meses × activos).
+      pseudo:     numpy.random.Generator
+      antithetic: la mitad de los shocks y sus opuestos (z, -z)
+      sobol:      Sobol escrambleado (scipy.stats.qmc) + inversa normal
+      halton:     Halton escrambleado (scipy.stats.qmc) + inversa normal
+    """
+    shape = (n_simulations, n_months, n_assets)
+    if sampling == "pseudo":
+        return rng.standard_normal(shape)
+    if sampling == "antithetic":
+        half = rng.standard_normal((math.ceil(n_simulations / 2), n_months, n_assets))
+        return np.concatenate([half, -half])[:n_simulations]
+    if sampling in ("sobol", "halton"):
+        from scipy.stats import norm, qmc
+
+        dim = n_months * n_assets
+        engine = (qmc.Sobol(d=dim, scramble=True, seed=rng) if sampling == "sobol"
+                  else qmc.Halton(d=dim, scramble=True, seed=rng))
+        uniforms = engine.random(n_simulations)
+        # Evitar ±inf en la inversa normal
+        uniforms = np.clip(uniforms, 1e-12, 1 - 1e-12)
+        return norm.ppf(uniforms).reshape(shape)
+    raise ValueError(f"Estrategia de muestreo desconocida: {sampling}")
+
+
+def simulate_portfolio_paths(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                             n_simulations: int, n_months: int,
+                             rng: np.random.Generator, sampling: str = "pseudo") -> np.ndarray:
+    """
+    Simula el valor acumulado del portfolio (inversión inicial 1.0).
+    cov: matriz (activos × activos) constante o trayectoria
+    (n_months × activos × activos).
+    Retorna matriz (n_simulations × n_months) con el valor al cierre de cada mes.
+    """
+    mu = np.asarray(mu, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    factor = covariance_factor(cov)
+    if factor.ndim == 3 and len(factor) != n_months:
+        raise ValueError(f"La trayectoria de covarianza tiene {len(factor)} meses, se pidieron {n_months}.")
+
+    # Tensor completo de shocks N(0, 1): (simulaciones × meses × activos)
+    shocks = standard_normal_draws(n_simulations, n_months, len(mu), rng, sampling)
+
+    # weights @ (mu + L z) == weights @ mu + z @ (L.T @ weights):
+    # proyectamos al portfolio sin materializar los retornos por activo
+    loadings = np.einsum("...ij,i->...j", factor, weights)
+    if loadings.ndim == 1:
+        portfolio_returns = weights @ mu + shocks @ loadings
+    else:
+        portfolio_returns = weights @ mu + np.einsum("nmj,mj->nm", shocks, loadings)
+    return np.cumprod(1 + portfolio_returns, axis=1)
+
+
+# ─────────────────────────────────────────────────────────────
+# MÉTRICAS DE RIESGO
+# ─────────────────────────────────────────────────────────────
+def risk_metrics(finals: np.ndarray) -> dict:
+    """VaR 95%, CVaR, percentiles y % de simulaciones positivas."""
+    var_95 = float(np.percentile(finals, 5))          # VaR 95%
+    cvar = float(finals[finals <= var_95].mean())     # CVaR
+    p5  = float(np.percentile(finals, 5))
+    p50 = float(np.median(finals))
+    p95 = float(np.percentile(finals, 95))
+    pct_positive = float((finals > 1.0).mean() * 100)
+
+    return {
+        "var_95":       round(var_95 - 1, 4),
+        "cvar":         round(cvar - 1, 4),
+        "worst_case":   round(p5 - 1, 4),
+        "base_case":    round(p50 - 1, 4),
+        "best_case":    round(p95 - 1, 4),
+        "pct_positive": round(pct_positive, 2),
+        "n_simulations": int(len(finals)),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# ARCHIVOS .npy MAPEADOS POR LA APP
+# ─────────────────────────────────────────────────────────────
+# El pipeline nunca escribe sobre un .npy que una sesión de la app puede
+# tener mapeado: escribe <stem>.tmp.npy y lo publica con os.replace (las
+# sesiones siguen leyendo su versión). En Windows no se puede reemplazar un
+# archivo mapeado: se publica como <stem>.<ns>.npy, que latest_npy prefiere
+# por ser el más reciente, y las versiones viejas se borran cuando ya nadie
+# las tiene mapeadas.
+def tmp_npy(path: str) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path[:-len(".npy")] + ".tmp.npy"
+
+
+def _npy_versions(path: str) -> list:
+    import glob
+
+    stem = path[:-len(".npy")]
+    return [p for p in glob.glob(glob.escape(stem) + ".*.npy") if not p.endswith(".tmp.npy")]
+
+
+def publish_npy(tmp: str, path: str) -> str:
+    """Reemplaza `path` por `tmp` (o lo publica como versión). Retorna la ruta publicada."""
+    import time
+
+    try:
+        os.replace(tmp, path)
+        written = path
+    except PermissionError:
+        written = f"{path[:-len('.npy')]}.{time.time_ns()}.npy"
+        os.replace(tmp, written)
+    for stale in _npy_versions(path) + [path]:
+        if stale != written:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return written
+
+
+def latest_npy(path: str, required: bool = False) -> Optional[str]:
+    """Versión más reciente de `path` (el archivo o una <stem>.<ns>.npy); None si no hay."""
+    candidates = [p for p in [path] + _npy_versions(path) if os.path.exists(p)]
+    if not candidates and required:
+        raise FileNotFoundError(path)
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+# ─────────────────────────────────────────────────────────────
+# ALMACÉN DE TRAYECTORIAS
+# ─────────────────────────────────────────────────────────────
+class PathStore:
+    """
+    Buffer float32 (n_paths × n_months+1) con las trayectorias del fan chart;
+    la columna 0 es el valor inicial 1.0.
+      kind="memory": array NumPy del proceso
+      kind="shm":    multiprocessing.shared_memory (los workers escriben
+                     directamente; el creador debe llamar a unlink())
+      kind="memmap": archivo .npy en output/ que la app abre con
+                     np.load(mmap_mode="r"); se escribe en <stem>.tmp.npy
+                     y publish() lo publica al terminar (publish_npy)
+    """
+
+    def __init__(self, array: np.ndarray, kind: str, location: Optional[str] = None, shm=None):
+        self.array = array
+        self.kind = kind
+        self.location = location
+        self.target = location
+        self._shm = shm
+
+    @classmethod
+    def create(cls, n_paths: int, n_steps: int, kind: str = "memory",
+               path: str = PATHS_FILE) -> "PathStore":
+        shape = (n_paths, n_steps)
+        if kind == "memory":
+            store = cls(np.empty(shape, dtype=np.float32), kind)
+        elif kind == "shm":
+            shm = shared_memory.SharedMemory(
+                create=True, size=max(1, n_paths * n_steps * np.dtype(np.float32).itemsize)
+            )
+            array = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            store = cls(array, kind, shm.name, shm)
+        elif kind == "memmap":
+            tmp = tmp_npy(path)
+            array = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape)
+            store = cls(array, kind, tmp)
+            store.target = path
+        else:
+            raise ValueError(f"PathStore desconocido: {kind}")
+        store.array[:, 0] = 1.0
+        return store
+
+    @property
+    def spec(self):
+        """Descriptor picklable para adjuntar el buffer desde otro proceso (None si no es compartible)."""
+        if self.kind == "memory":
+            return None
+        return (self.kind, self.location, self.array.shape)
+
+    @classmethod
+    def attach(cls, spec: tuple) -> "PathStore":
+        kind, location, shape = spec
+        if kind == "shm":
+            shm = shared_memory.SharedMemory(name=location)
+            return cls(np.ndarray(shape, dtype=np.float32, buffer=shm.buf), kind, location, shm)
+        return cls(np.load(location, mmap_mode="r+"), kind, location)
+
+    def write(self, start: int, paths: np.ndarray) -> None:
+        """Copia las trayectorias de simulaciones [start, ...) que caben en el buffer."""
+        n_rows = min(len(paths), len(self.array) - start)
+        if n_rows > 0:
+            self.array[start:start + n_rows, 1:] = paths[:n_rows]
+
+    def flush(self) -> None:
+        if self.kind == "memmap":
+            self.array.flush()
+
+    def publish(self) -> str:
+        """
+        memmap: cierra el temporal, lo publica en la ruta final y reabre el
+        array en sólo lectura. Sin efecto para los otros tipos.
+        """
+        if self.kind != "memmap" or self.location != tmp_npy(self.target):
+            return self.location
+        self.flush()
+        self.array = None
+        self.location = publish_npy(tmp_npy(self.target), self.target)
+        self.array = np.load(self.location, mmap_mode="r")
+        return self.location
+
+    def close(self) -> None:
+        self.flush()
+        if self._shm is not None:
+            self.array = None
+            self._shm.close()
+
+    def unlink(self) -> None:
+        if self._shm is not None:
+            self._shm.unlink()
+
+
+def open_paths(path: str = PATHS_FILE) -> np.ndarray:
+    """Abre en sólo lectura las trayectorias más recientes del pipeline (sin copiar)."""
+    return np.load(latest_npy(path, required=True), mmap_mode="r")
+
+
+# ─────────────────────────────────────────────────────────────
+# FINALES ORDENADOS (MAPEADOS EN MEMORIA)
+# ─────────────────────────────────────────────────────────────
+def save_finals(finals: np.ndarray, path: str = FINALS_FILE) -> str:
+    """
+    Guarda los valores finales ordenados (float64) como .npy, escrito a un
+    temporal y publicado con publish_npy. Retorna la ruta escrita.
+    """
+    tmp = tmp_npy(path)
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(len(finals),))
+    out[:] = np.sort(np.asarray(finals, dtype=np.float64))
+    out.flush()
+    del out
+    return publish_npy(tmp, path)
+
+
+def open_finals(path: str = FINALS_FILE) -> np.ndarray:
+    """Abre en sólo lectura los finales ordenados más recientes del pipeline (sin copiar)."""
+    return np.load(latest_npy(path, required=True), mmap_mode="r")
+
+
+def sorted_quantile(sorted_finals: np.ndarray, q) -> np.ndarray:
+    """Cuantil(es) con interpolación lineal (igual a np.quantile) leyendo 2 valores por q."""
+    pos = np.asarray(q, dtype=float) * (len(sorted_finals) - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, len(sorted_finals) - 1)
+    return sorted_finals[lo] + (pos - lo) * (sorted_finals[hi] - sorted_finals[lo])
+
+
+def sorted_histogram(sorted_finals: np.ndarray, bins: int = 80, value_range: Optional[tuple] = None) -> tuple:
+    """
+    (edges, counts) como np.histogram, con bordes equiespaciados entre
+    min y max (o value_range): un searchsorted por borde.
+    """
+    lo, hi = value_range or (float(sorted_finals[0]), float(sorted_finals[-1]))
+    edges = np.linspace(lo, hi, bins + 1)
+    idx = np.searchsorted(sorted_finals, edges, side="left")
+    idx[-1] = np.searchsorted(sorted_finals, hi, side="right")
+    return edges, np.diff(idx)
+
+
+def summarize_finals(finals: np.ndarray, n_bins: int = 80, n_tail_bins: int = 20,
+                     n_quantiles: int = 1001, tail_levels=TAIL_LEVELS,
+                     is_sorted: bool = False) -> dict:
+    """
+    Resumen de tamaño fijo de la distribución de valores finales:
+      edges/counts:           histograma de n_bins entre min y max
+      tail_edges/tail_counts: histograma de n_tail_bins de la región VaR 95%
+      quantiles/values:       grilla de n_quantiles cuantiles en [0, 1]
+      tail_levels + lower/upper_tail_means: media por debajo del cuantil
+                              a (CVaR) y por encima del cuantil 1 - a
+      pct_positive, n_simulations
+    Con is_sorted=True (p.ej. open_finals) no se copia ni se ordena.
+    """
+    sorted_finals = finals if is_sorted else np.sort(np.asarray(finals, dtype=np.float64))
+    n = len(sorted_finals)
+    tail_levels = np.asarray(tail_levels, dtype=float)
+
+    lower = sorted_quantile(sorted_finals, tail_levels)
+    upper = sorted_quantile(sorted_finals, 1 - tail_levels)
+    k_lower = np.searchsorted(sorted_finals, lower, side="right")
+    k_upper = np.searchsorted(sorted_finals, upper, side="left")
+    edges, counts = sorted_histogram(sorted_finals, n_bins)
+    var_95 = float(sorted_quantile(sorted_finals, 0.05))
+    tail_edges, tail_counts = sorted_histogram(sorted_finals, n_tail_bins, (float(sorted_finals[0]), var_95))
+    quantiles = np.linspace(0, 1, n_quantiles)
+
+    return {
+        "edges":            edges,
+        "counts":           counts,
+        "tail_edges":       tail_edges,
+        "tail_counts":      tail_counts,
+        "quantiles":        quantiles,
+        "values":           sorted_quantile(sorted_finals, quantiles),
+        "tail_levels":      tail_levels,
+        "lower_tail_means": np.array([sorted_finals[:k].mean() for k in k_lower]),
+        "upper_tail_means": np.array([sorted_finals[k:].mean() for k in k_upper]),
+        "pct_positive":     (n - int(np.searchsorted(sorted_finals, 1.0, side="right"))) / n * 100,
+        "n_simulations":    n,
+    }
+
+
+def summarize_accumulator(acc: "RiskAccumulator", n_bins: int = 80, n_tail_bins: int = 20,
+                          n_quantiles: int = 1001, tail_levels=TAIL_LEVELS) -> dict:
+    """
+    summarize_finals para el modo streaming: el mismo resumen a partir del
+    RiskAccumulator combinado de todos los bloques (conteos y sumas por
+    bucket del sketch, sumados bloque a bloque), con el error relativo del
+    sketch en lugar de valores exactos.
+    """
+    sk = acc.sketch
+    tail_levels = np.asarray(tail_levels, dtype=float)
+    quantiles = np.linspace(0, 1, n_quantiles)
+    edges, counts = sk.histogram(n_bins)
+    tail_edges, tail_counts = sk.histogram(n_tail_bins, (sk.min, sk.quantile(0.05)))
+    return {
+        "edges":            edges,
+        "counts":           counts,
+        "tail_edges":       tail_edges,
+        "tail_counts":      tail_counts,
+        "quantiles":        quantiles,
+        "values":           sk.quantiles(quantiles),
+        "tail_levels":      tail_levels,
+        "lower_tail_means": sk.tail_means(tail_levels),
+        "upper_tail_means": sk.tail_means(tail_levels, upper=True),
+        "pct_positive":     acc.n_positive / acc.count * 100,
+        "n_simulations":    acc.count,
+    }
+
+
+def summary_metrics(summary: dict) -> dict:
+    """risk_metrics a partir del resumen (cuantiles de la grilla, CVaR de las medias de cola)."""
+    p5, p50, p95 = np.interp([0.05, 0.50, 0.95], summary["quantiles"], summary["values"])
+    cvar = np.interp(0.05, summary["tail_levels"], summary["lower_tail_means"])
+    return {
+        "var_95":       round(float(p5) - 1, 4),
+        "cvar":         round(float(cvar) - 1, 4),
+        "worst_case":   round(float(p5) - 1, 4),
+        "base_case":    round(float(p50) - 1, 4),
+        "best_case":    round(float(p95) - 1, 4),
+        "pct_positive": round(float(summary["pct_positive"]), 2),
+        "n_simulations": int(summary["n_simulations"]),
+    }
+
+
+def save_summary(summary: dict, path: str = SUMMARY_FILE) -> str:
+    """Guarda el resumen de summarize_finals como .npz (unos pocos KB)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, **{k: np.asarray(v) for k, v in summary.items()})
+    return path
+
+
+def load_summary(path: str = SUMMARY_FILE) -> dict:
+    with np.load(path) as data:
+        summary = {k: data[k] for k in data.files}
+    summary["pct_positive"] = float(summary["pct_positive"])
+    summary["n_simulations"] = int(summary["n_simulations"])
+    return summary
+
+
+# ─────────────────────────────────────────────────────────────
+# MODO STREAMING: SKETCH DE CUANTILES Y ACUMULADORES
+# ─────────────────────────────────────────────────────────────
+class QuantileSketch:
+    """
+    Sketch de cuantiles mergeable con buckets logarítmicos.
+    Cada valor cae en el bucket k = ceil(log_gamma(x)); el representante
+    del bucket tiene error relativo <= rel_error. Guarda además la suma
+    de valores por bucket para calcular medias de cola (CVaR).
+    Dos sketches con los mismos parámetros se combinan sumando arrays.
+    """
+
+    def __init__(self, rel_error: float = 5e-4, min_value: float = 1e-3, max_value: float = 1e3):
+        self.rel_error = rel_error
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + rel_error) / (1 - rel_error)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = math.ceil(math.log(min_value) / self.log_gamma)
+        n_bins = math.ceil(math.log(max_value) / self.log_gamma) - self.offset + 1
+        # Índice 0: underflow (< min_value, incluye valores <= 0); último: overflow
+        self.counts = np.zeros(n_bins + 2, dtype=np.int64)
+        self.sums = np.zeros(n_bins + 2)
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        safe = np.clip(values, self.min_value, self.max_value)
+        idx = np.ceil(np.log(safe) / self.log_gamma).astype(np.int64) - self.offset + 1
+        idx[values < self.min_value] = 0
+        idx[values > self.max_value] = len(self.counts) - 1
+        return idx
+
+    def _representative(self, idx: int) -> float:
+        if idx == 0:
+            return self.min
+        if idx == len(self.counts) - 1:
+            return self.max
+        return 2 * self.gamma ** (idx + self.offset - 1) / (self.gamma + 1)
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return
+        idx = self._bucket(values)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+        self.sums += np.bincount(idx, weights=values, minlength=len(self.counts))
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if (other.rel_error, other.min_value, other.max_value) != \
+                (self.rel_error, self.min_value, self.max_value):
+            raise ValueError("Sketches con parámetros distintos no se pueden combinar.")
+        self.counts += other.counts
+        self.sums += other.sums
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _rank_bucket(self, q: float) -> int:
+        rank = q * (self.count - 1)
+        return int(np.searchsorted(np.cumsum(self.counts), rank, side="right"))
+
+    def quantile(self, q: float) -> float:
+        """Cuantil q ∈ [0, 1] con error relativo <= rel_error."""
+        if self.count == 0:
+            return math.nan
+        return float(np.clip(self._representative(self._rank_bucket(q)), self.min, self.max))
+
+    def tail_mean(self, q: float) -> float:
+        """Media de los valores en o por debajo del bucket del cuantil q."""
+        if self.count == 0:
+            return math.nan
+        idx = self._rank_bucket(q)
+        return float(self.sums[:idx + 1].sum() / self.counts[:idx + 1].sum())
+
+    def quantiles(self, qs) -> np.ndarray:
+        """quantile() para un vector de q con un solo cumsum."""
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, math.nan)
+        idx = np.searchsorted(np.cumsum(self.counts), qs * (self.count - 1), side="right")
+        reps = np.array([self._representative(int(i)) for i in idx])
+        return np.clip(reps, self.min, self.max)
+
+    def tail_means(self, qs, upper: bool = False) -> np.ndarray:
+        """
+        Media de los valores en o por debajo del bucket de cada cuantil q
+        (upper=True: en o por encima del bucket del cuantil 1 - q).
+        """
+        qs = np.asarray(qs, dtype=float)
+        cum = np.cumsum(self.counts)
+        sums = np.cumsum(self.sums)
+        if not upper:
+            idx = np.searchsorted(cum, qs * (self.count - 1), side="right")
+            return sums[idx] / cum[idx]
+        idx = np.searchsorted(cum, (1 - qs) * (self.count - 1), side="right")
+        before_c = np.where(idx > 0, cum[idx - 1], 0)
+        before_s = np.where(idx > 0, sums[idx - 1], 0.0)
+        return (sums[-1] - before_s) / (cum[-1] - before_c)
+
+    def histogram(self, bins: int, value_range: Optional[tuple] = None) -> tuple:
+        """
+        (edges, counts) con bordes lineales entre min y max (o value_range):
+        la CDF del sketch, lineal dentro de cada bucket, evaluada en los
+        bordes. Los conteos son fraccionarios y suman los valores del rango.
+        """
+        lo, hi = value_range or (self.min, self.max)
+        edges = np.linspace(lo, hi, bins + 1)
+        k = np.arange(1, len(self.counts) - 1)
+        bounds = np.concatenate([[self.gamma ** (self.offset - 1)], self.gamma ** (k + self.offset - 1)])
+        bounds = np.clip(bounds, self.min, self.max)
+        cdf = self.counts[0] + np.concatenate([[0], np.cumsum(self.counts[1:-1])])
+        at_edges = np.interp(edges, bounds, cdf.astype(float))
+        at_edges[edges >= self.max] += self.counts[-1]
+        counts = np.diff(at_edges)
+        if lo <= self.min:
+            counts[0] += at_edges[0]
+        return edges, counts
+
+
+class RiskAccumulator:
+    """Acumuladores mergeables de los valores finales del portfolio."""
+
+    def __init__(self, rel_error: float = 5e-4):
+        self.sketch = QuantileSketch(rel_error=rel_error)
+        self.n_positive = 0
+
+    @property
+    def count(self) -> int:
+        return self.sketch.count
+
+    def add(self, finals: np.ndarray) -> None:
+        self.sketch.add(finals)
+        self.n_positive += int((finals > 1.0).sum())
+
+    def merge(self, other: "RiskAccumulator") -> None:
+        self.sketch.merge(other.sketch)
+        self.n_positive += other.n_positive
+
+    def metrics(self) -> dict:
+        """Mismas claves que risk_metrics, a partir del sketch."""
+        var_95 = self.sketch.quantile(0.05)
+        p50 = self.sketch.quantile(0.50)
+        p95 = self.sketch.quantile(0.95)
+        cvar = self.sketch.tail_mean(0.05)
+        pct_positive = self.n_positive / self.count * 100 if self.count else math.nan
+
+        return {
+            "var_95":       round(var_95 - 1, 4),
+            "cvar":         round(cvar - 1, 4),
+            "worst_case":   round(var_95 - 1, 4),
+            "base_case":    round(p50 - 1, 4),
+            "best_case":    round(p95 - 1, 4),
+            "pct_positive": round(pct_positive, 2),
+            "n_simulations": self.count,
+        }
+
+
+class BandAccumulator:
+    """
+    Sketch de cuantiles por mes (meses × buckets) sobre todas las
+    trayectorias; mergeable como QuantileSketch. Alimenta el fan chart
+    en los modos paralelo y streaming.
+    """
+
+    def __init__(self, n_months: int, rel_error: float = 5e-4):
+        self._index = QuantileSketch(rel_error=rel_error)   # mapeo valor → bucket
+        self.n_months = n_months
+        self.counts = np.zeros((n_months, len(self._index.counts)), dtype=np.int64)
+
+    def add(self, paths: np.ndarray) -> None:
+        n_bins = self.counts.shape[1]
+        idx = self._index._bucket(np.asarray(paths, dtype=float).ravel()).reshape(paths.shape)
+        flat = (idx + np.arange(self.n_months) * n_bins).ravel()
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def merge(self, other: "BandAccumulator") -> None:
+        self.counts += other.counts
+
+    def quantiles(self, qs=BAND_QUANTILES) -> np.ndarray:
+        """Matriz (len(qs) × n_months) con error relativo <= rel_error."""
+        sk = self._index
+        cum = np.cumsum(self.counts, axis=1)
+        total = cum[:, -1]
+        bands = np.empty((len(qs), self.n_months))
+        for i, q in enumerate(qs):
+            idx = (cum > (q * (total - 1))[:, None]).argmax(axis=1)
+            values = 2 * sk.gamma ** (idx + sk.offset - 1) / (sk.gamma + 1)
+            values[idx == 0] = sk.min_value
+            values[idx == cum.shape[1] - 1] = sk.max_value
+            bands[i] = values
+        return bands
+
+
+def path_quantiles(paths: np.ndarray, qs=BAND_QUANTILES) -> np.ndarray:
+    """Cuantiles exactos por mes en una sola pasada: matriz (len(qs) × n_months)."""
+    return np.quantile(paths, qs, axis=0)
+
+
+def save_bands(bands: np.ndarray, path: str = BANDS_FILE, qs=BAND_QUANTILES) -> None:
+    """Guarda las bandas (con el mes 0 = 1.0) como artefacto .npz compacto."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    full = np.hstack([np.ones((len(bands), 1)), bands]).astype(np.float32)
+    np.savez(path, quantiles=np.asarray(qs, dtype=np.float32), bands=full)
+
+
+def load_bands(path: str = BANDS_FILE) -> tuple:
+    """(quantiles, bands) con bands de forma (len(quantiles) × n_months+1)."""
+    with np.load(path) as data:
+        return data["quantiles"], data["bands"]
+
+
+def chunk_sizes(n_simulations: int, chunk_size: int) -> list:
+    """Divide n_simulations en bloques de chunk_size (el último puede ser menor)."""
+    full, rest = divmod(n_simulations, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def resolve_workers(n_workers: Optional[int] = None) -> int:
+    """None/1 → serial; -1 → todos los núcleos."""
+    if n_workers is None:
+        return 1
+    if n_workers < 0:
+        return os.cpu_count() or 1
+    return max(1, n_workers)
+
+
+def _simulate_batch(task: tuple) -> dict:
+    """
+    Simula un bloque con su propio stream (ejecutable en otro proceso).
+    Las primeras trayectorias se escriben en el PathStore; si el buffer
+    no es compartible entre procesos se devuelven para que las copie el padre.
+    """
+    (mu, cov, weights, size, n_months, stream, start, store,
+     keep_finals, rel_error, sampling) = task
+    paths = simulate_portfolio_paths(
+        mu, cov, weights, size, n_months, np.random.default_rng(stream), sampling
+    )
+    finals = paths[:, -1]
+    acc = RiskAccumulator(rel_error=rel_error)
+    acc.add(finals)
+    bands = BandAccumulator(n_months, rel_error=rel_error)
+    bands.add(paths)
+
+    pending = None
+    if isinstance(store, tuple):
+        attached = PathStore.attach(store)
+        attached.write(start, paths)
+        attached.close()
+    elif isinstance(store, PathStore):
+        store.write(start, paths)
+    elif store is not None:
+        pending = paths[:store].copy()
+
+    return {
+        "finals": finals.copy() if keep_finals else None,
+        "start": start,
+        "paths": pending,
+        "accumulator": acc,
+        "bands": bands,
+    }
+
+
+def simulate_batches(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                     n_simulations: int, n_months: int, batch_size: int,
+                     seed: int = 42, n_workers: Optional[int] = None, store: Optional[PathStore] = None,
+                     keep_finals: bool = True, rel_error: float = 5e-4,
+                     sampling: str = "pseudo"):
+    """
+    Genera los resultados de cada bloque en orden.
+    El bloque i usa siempre el stream i de SeedSequence(seed).spawn, así
+    el resultado es idéntico bit a bit en serie o con cualquier número
+    de procesos para el mismo seed y batch_size.
+    Las trayectorias de las simulaciones [0, len(store.array)) se escriben
+    en `store`; con shared_memory/memmap cada proceso escribe su tramo.
+    Con keep_finals=False sólo el primer bloque devuelve sus finales.
+    """
+    sizes = chunk_sizes(n_simulations, batch_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+    n_paths = len(store.array) if store is not None else 0
+    n_workers = min(resolve_workers(n_workers), len(sizes))
+
+    def target(start):
+        if start >= n_paths:
+            return None
+        if n_workers <= 1:
+            return store
+        # memoria local: el worker devuelve las filas que le tocan
+        return store.spec if store.spec is not None else n_paths - start
+
+    tasks = [
+        (mu, cov, weights, size, n_months, stream, int(start), target(start),
+         keep_finals or i == 0, rel_error, sampling)
+        for i, (size, stream, start) in enumerate(zip(sizes, streams, starts))
+    ]
+
+    if n_workers <= 1:
+        for task in tasks:
+            yield _simulate_batch(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        for batch in pool.map(_simulate_batch, tasks):
+            if batch["paths"] is not None:
+                store.write(batch["start"], batch["paths"])
+            yield batch
+
+
+def simulate_streaming(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                       n_simulations: int, n_months: int, chunk_size: int,
+                       seed: int = 42, store: Optional[PathStore] = None, rel_error: float = 5e-4,
+                       n_workers: Optional[int] = None, sampling: str = "pseudo") -> dict:
+    """
+    Simula por bloques de chunk_size y acumula cada bloque en un
+    RiskAccumulator; la memoria pico depende sólo de chunk_size.
+    Cada bloque usa su propio stream derivado con SeedSequence.spawn;
+    con n_workers > 1 los bloques se reparten entre procesos.
+
+    Retorna dict con:
+      accumulator:   RiskAccumulator con todas las simulaciones
+      sample_finals: valores finales del primer bloque (muestra i.i.d.)
+      bands:         BandAccumulator por mes para el fan chart
+      sketch_report: distancia entre métricas del sketch y exactas
+                     sobre el primer bloque
+    Las trayectorias quedan en `store`.
+    """
+    acc = RiskAccumulator(rel_error=rel_error)
+    bands = BandAccumulator(n_months, rel_error=rel_error)
+    sample_finals, report = None, None
+
+    for batch in simulate_batches(mu, cov, weights, n_simulations, n_months, chunk_size,
+                                  seed=seed, n_workers=n_workers, store=store,
+                                  keep_finals=False, rel_error=rel_error,
+                                  sampling=sampling):
+        acc.merge(batch["accumulator"])
+        bands.merge(batch["bands"])
+        if sample_finals is None:
+            sample_finals = batch["finals"]
+            report = sketch_report(sample_finals, rel_error=rel_error)
+
+    return {
+        "accumulator": acc,
+        "sample_finals": sample_finals,
+        "bands": bands,
+        "sketch_report": report,
+    }
+
+
+def simulate_parallel(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                      n_simulations: int, n_months: int, seed: int = 42,
+                      n_workers: int = -1, store: Optional[PathStore] = None,
+                      sampling: str = "pseudo") -> dict:
+    """
+    Modo exacto en paralelo: un bloque por proceso, concatena los finales
+    en orden de bloque y combina los acumuladores.
+    Reproducible bit a bit para el mismo seed y número de procesos.
+    """
+    n_workers = resolve_workers(n_workers)
+    batch_size = math.ceil(n_simulations / n_workers)
+    acc = RiskAccumulator()
+    bands = BandAccumulator(n_months)
+    finals = []
+
+    for batch in simulate_batches(mu, cov, weights, n_simulations, n_months, batch_size,
+                                  seed=seed, n_workers=n_workers, store=store,
+                                  sampling=sampling):
+        finals.append(batch["finals"])
+        acc.merge(batch["accumulator"])
+        bands.merge(batch["bands"])
+
+    return {"finals": np.concatenate(finals), "accumulator": acc, "bands": bands}
+
+
+def sketch_report(finals: np.ndarray, rel_error: float = 5e-4) -> dict:
+    """Compara métricas exactas vs sketch sobre una misma muestra."""
+    exact = risk_metrics(finals)
+    acc = RiskAccumulator(rel_error=rel_error)
+    acc.add(finals)
+    streamed = acc.metrics()
+    keys = ["var_95", "cvar", "base_case", "best_case"]
+    diffs = {k: abs(streamed[k] - exact[k]) for k in keys}
+    return {
+        "rel_error_bound": rel_error,
+        "sample_size": int(len(finals)),
+        "abs_diff": diffs,
+        "max_abs_diff": max(diffs.values()),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# MOTOR INCREMENTAL (slider de la app)
+# ─────────────────────────────────────────────────────────────
+class IncrementalMonteCarlo:
+    """
+    Motor que conserva los finales ya simulados.
+    finals(n) sólo simula los bloques que faltan si n crece y devuelve
+    una vista de los existentes si n baja. El bloque i usa siempre el
+    stream i de SeedSequence(seed), así los primeros n finales no dependen
+    del historial de peticiones (y coinciden con simulate_batches para el
+    mismo batch_size).
+    """
+
+    def __init__(self, mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                 n_months: int = 12, seed: int = 42, batch_size: int = 500):
+        self.mu = np.asarray(mu, dtype=float)
+        self.cov = np.asarray(cov, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.n_months = n_months
+        self.seed = seed
+        self.batch_size = batch_size
+        self._finals = np.empty(0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_prices(cls, prices, volatility: str = MC_VOLATILITY, **kwargs) -> "IncrementalMonteCarlo":
+        """Motor con el mismo modelo de covarianza que el pipeline (simulation_inputs)."""
+        mu, cov, weights, _ = simulation_inputs(prices, kwargs.get("n_months", 12), volatility)
+        return cls(mu, cov, weights, **kwargs)
+
+    @property
+    def n_simulated(self) -> int:
+        return len(self._finals)
+
+    def _simulate_batch(self, i: int) -> np.ndarray:
+        stream = np.random.SeedSequence(self.seed, spawn_key=(i,))
+        paths = simulate_portfolio_paths(
+            self.mu, self.cov, self.weights, self.batch_size, self.n_months,
+            np.random.default_rng(stream),
+        )
+        return paths[:, -1]
+
+    def finals(self, n_simulations: int) -> np.ndarray:
+        """Primeros n_simulations valores finales (vista de sólo lectura)."""
+        with self._lock:
+            done = self.n_simulated // self.batch_size
+            needed = math.ceil(n_simulations / self.batch_size)
+            if needed > done:
+                new = [self._simulate_batch(i) for i in range(done, needed)]
+                self._finals = np.concatenate([self._finals] + new)
+                self._finals.flags.writeable = False
+            return self._finals[:n_simulations]
+
+    def metrics(self, n_simulations: int) -> dict:
+        return risk_metrics(self.finals(n_simulations))
+
+
+# ─────────────────────────────────────────────────────────────
+# REDUCCIÓN DE VARIANZA
+# ─────────────────────────────────────────────────────────────
+def control_variate_mean(paths: np.ndarray, mu_p: float) -> tuple:
+    """
+    Estimador del valor final esperado con variable de control.
+    Control: 1 + Σ retornos mensuales del portfolio, con media analítica
+    1 + n_months · mu_p (mu_p = weights @ mu).
+    Retorna (estimación, error estándar).
+    """
+    prev = np.hstack([np.ones((len(paths), 1)), paths[:, :-1]])
+    control = 1 + (paths / prev - 1).sum(axis=1)
+    finals = paths[:, -1]
+
+    c = np.cov(finals, control)
+    beta = c[0, 1] / c[1, 1] if c[1, 1] > 0 else 0.0
+    adjusted = finals - beta * (control - (1 + paths.shape[1] * mu_p))
+    return float(adjusted.mean()), float(adjusted.std(ddof=1) / math.sqrt(len(adjusted)))
+
+
+def compare_sampling(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                     n_simulations: int = 4096, n_months: int = 12,
+                     n_replications: int = 20, seed: int = 42,
+                     strategies: tuple = SAMPLING_STRATEGIES):
+    """
+    Error estándar de VaR/CVaR/media de cada estrategia entre réplicas
+    independientes y tiempo de CPU por réplica.
+    efficiency = 1 / (se² · cpu): precisión por unidad de CPU (mayor es mejor).
+    La columna mean_se_cv aplica además la variable de control.
+    """
+    import time
+
+    import pandas as pd
+
+    mu_p = float(np.asarray(weights) @ np.asarray(mu))
+    rows = []
+    for sampling in strategies:
+        streams = np.random.SeedSequence(seed).spawn(n_replications)
+        var, cvar, mean, mean_cv, cpu = [], [], [], [], 0.0
+        for stream in streams:
+            t0 = time.process_time()
+            paths = simulate_portfolio_paths(
+                mu, cov, weights, n_simulations, n_months,
+                np.random.default_rng(stream), sampling,
+            )
+            finals = paths[:, -1]
+            var_q = float(np.quantile(finals, 0.05))
+            cvar_q = float(finals[finals <= var_q].mean())
+            cpu += time.process_time() - t0
+            # Sin redondear (risk_metrics redondea a 1e-4): el error estándar
+            # entre réplicas no debe quedar dominado por la cuantización
+            var.append(var_q - 1)
+            cvar.append(cvar_q - 1)
+            mean.append(finals.mean() - 1)
+            mean_cv.append(control_variate_mean(paths, mu_p)[0] - 1)
+
+        cpu /= n_replications
+        var_se = float(np.std(var, ddof=1))
+        cvar_se = float(np.std(cvar, ddof=1))
+        rows.append({
+            "strategy":        sampling,
+            "n_simulations":   n_simulations,
+            "var_95":          round(float(np.mean(var)), 4),
+            "var_se":          var_se,
+            "cvar_se":         cvar_se,
+            "mean_se":         float(np.std(mean, ddof=1)),
+            "mean_se_cv":      float(np.std(mean_cv, ddof=1)),
+            "cpu_seconds":     cpu,
+            "var_efficiency":  1 / (var_se ** 2 * cpu) if var_se and cpu else math.inf,
+            "cvar_efficiency": 1 / (cvar_se ** 2 * cpu) if cvar_se and cpu else math.inf,
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,398 @@
+# price_store.py — Almacén columnar de precios (mensual, diario, intradía)
+"""
+Precios de cierre en formato ancho (fechas × tickers) por intervalo, en
+data/prices/<interval>/:
+  - Partes append-only: cada refresco escribe sólo las barras nuevas
+    (part-00001, part-00002, ...); al leer, una barra repetida toma el
+    valor de la parte más reciente. Con demasiadas partes se compactan
+  - Cada parte es Parquet si hay pyarrow; si no, un directorio de
+    columnas .npy (una por ticker + el índice de fechas), abribles con mmap
+  - meta.json: frescura por ticker (primera/última barra, filas,
+    proveedor y momento de la descarga)
+  - Proveedores intercambiables (yfinance, sintético determinístico para
+    pruebas offline); refresh_prices descarga sólo el rango faltante
+  - Lectura con proyección de columnas (tickers) y rango de fechas
+  - Remuestreo vectorizado a la frecuencia de modelado (p.ej. diario → "MS")
+
+Usado por financial_pipeline.load_financial_data.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = "data/prices"
+
+# Intervalo de yfinance → frecuencia pandas de las barras
+INTERVAL_FREQ = {
+    "1mo": "MS", "1wk": "W-MON", "1d": "B",
+    "1h": "h", "30m": "30min", "15m": "15min", "5m": "5min", "1m": "min",
+}
+# Barras por mes (escala de la serie sintética de fallback)
+INTERVAL_STEPS_PER_MONTH = {
+    "1mo": 1, "1wk": 4.35, "1d": 21,
+    "1h": 21 * 7, "30m": 21 * 13, "15m": 21 * 26, "5m": 21 * 78, "1m": 21 * 390,
+}
+# Máximo histórico (días) que yfinance entrega por intervalo
+INTERVAL_MAX_DAYS = {
+    "1mo": 5 * 365, "1wk": 5 * 365, "1d": 5 * 365,
+    "1h": 729, "30m": 59, "15m": 59, "5m": 59, "1m": 7,
+}
+# Partes acumuladas antes de compactar el intervalo en una sola
+MAX_PARTS = 16
+# Diferencia relativa en la barra de control que indica un re-ajuste del
+# proveedor (split/dividendo con auto_adjust) → se re-descarga la historia
+REBASE_TOLERANCE = 1e-4
+
+
+def _has_parquet() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ─────────────────────────────────────────────────────────────
+# PARTES
+# ─────────────────────────────────────────────────────────────
+def interval_dir(interval: str, store_dir: str = STORE_DIR) -> str:
+    return os.path.join(store_dir, interval)
+
+
+def _parts(interval: str, store_dir: str = STORE_DIR) -> list:
+    """Rutas de las partes del intervalo, de la más antigua a la más nueva."""
+    root = interval_dir(interval, store_dir)
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root)) if name.startswith("part-")]
+
+
+def _next_part(interval: str, store_dir: str = STORE_DIR) -> str:
+    root = interval_dir(interval, store_dir)
+    os.makedirs(root, exist_ok=True)
+    parts = _parts(interval, store_dir)
+    number = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 1
+    return os.path.join(root, f"part-{number:05d}" + (".parquet" if _has_parquet() else ""))
+
+
+def _write_part(prices: pd.DataFrame, path: str) -> None:
+    prices = prices.sort_index()
+    if path.endswith(".parquet"):
+        prices.rename_axis("date").to_parquet(path)
+        return
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "_index.npy"), prices.index.values.astype("datetime64[ns]"))
+    np.save(os.path.join(path, "_columns.npy"), np.array(prices.columns, dtype=str))
+    for ticker in prices.columns:
+        np.save(os.path.join(path, f"{ticker}.npy"), prices[ticker].to_numpy(dtype=np.float64))
+
+
+def _read_part(path: str, tickers: Optional[list] = None, start=None, end=None) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        names = pq.ParquetFile(path).schema_arrow.names
+        columns = None if tickers is None else [t for t in tickers if t in names]
+        return pd.read_parquet(path, columns=columns).loc[start:end]
+
+    index = pd.DatetimeIndex(np.load(os.path.join(path, "_index.npy")), name="date")
+    lo = 0 if start is None else index.searchsorted(pd.Timestamp(start), side="left")
+    hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side="right")
+    stored = np.load(os.path.join(path, "_columns.npy")).tolist()
+    columns = stored if tickers is None else [t for t in tickers if t in stored]
+    data = {t: np.load(os.path.join(path, f"{t}.npy"), mmap_mode="r")[lo:hi] for t in columns}
+    return pd.DataFrame(data, index=index[lo:hi])
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def append_prices(prices: pd.DataFrame, interval: str, store_dir: str = STORE_DIR,
+                  max_parts: int = MAX_PARTS) -> str:
+    """
+    Agrega una parte con las barras de `prices` (costo proporcional a las
+    barras nuevas). Con más de max_parts partes, compacta todo en una.
+    """
+    path = _next_part(interval, store_dir)
+    _write_part(prices, path)
+    if len(_parts(interval, store_dir)) > max_parts:
+        write_prices(read_prices(interval, store_dir=store_dir), interval, store_dir)
+        return _parts(interval, store_dir)[0]
+    return path
+
+
+def write_prices(prices: pd.DataFrame, interval: str, store_dir: str = STORE_DIR) -> str:
+    """Reemplaza todo el intervalo por una sola parte con `prices`."""
+    old = _parts(interval, store_dir)
+    path = _next_part(interval, store_dir)
+    _write_part(prices, path)
+    for part in old:
+        _remove(part)
+    return path
+
+
+def read_prices(interval: str, tickers: Optional[list] = None, start=None, end=None,
+                store_dir: str = STORE_DIR) -> pd.DataFrame:
+    """
+    Lee sólo las columnas `tickers` (None = todas) y el rango [start, end]
+    de todas las partes; una barra repetida toma el valor más reciente.
+    Retorna DataFrame vacío si el intervalo no está almacenado.
+    """
+    frames = [_read_part(path, tickers, start, end) for path in _parts(interval, store_dir)]
+    frames = [f for f in frames if len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    merged = pd.concat(frames)
+    merged = merged.groupby(level=0, sort=True).last()
+    merged.index.name = "date"
+    columns = list(dict.fromkeys(c for f in frames for c in f.columns))
+    return merged[columns]
+
+
+# ─────────────────────────────────────────────────────────────
+# METADATA DE FRESCURA
+# ─────────────────────────────────────────────────────────────
+def _meta_path(interval: str, store_dir: str = STORE_DIR) -> str:
+    return os.path.join(interval_dir(interval, store_dir), "meta.json")
+
+
+def read_meta(interval: str, store_dir: str = STORE_DIR) -> dict:
+    try:
+        with open(_meta_path(interval, store_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta: dict, interval: str, store_dir: str = STORE_DIR) -> None:
+    path = _meta_path(interval, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, path)
+
+
+def freshness(interval: str, store_dir: str = STORE_DIR) -> pd.DataFrame:
+    """Una fila por ticker: primera/última barra, filas, proveedor y antigüedad de la descarga."""
+    meta = read_meta(interval, store_dir)
+    if not meta:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_dict(meta, orient="index")
+    df["age_hours"] = ((pd.Timestamp.now() - pd.to_datetime(df["fetched_at"]))
+                       .dt.total_seconds() / 3600).round(2)
+    return df
+
+
+# ─────────────────────────────────────────────────────────────
+# PROVEEDORES
+# ─────────────────────────────────────────────────────────────
+class PriceProvider(ABC):
+    """fetch(tickers, start, end, interval) → cierres (fechas × tickers), start/end inclusive."""
+
+    name = "base"
+
+    @abstractmethod
+    def fetch(self, tickers: list, start: datetime.date, end: datetime.date,
+              interval: str) -> pd.DataFrame:
+        ...
+
+
+class YFinanceProvider(PriceProvider):
+    name = "yfinance"
+
+    def fetch(self, tickers, start, end, interval):
+        import yfinance as yf
+
+        raw = yf.download(
+            list(tickers), start=start.isoformat(),
+            end=(end + datetime.timedelta(days=1)).isoformat(),
+            interval=interval, auto_adjust=True, progress=False
+        )
+        close = raw["Close"] if "Close" in raw.columns else raw.xs("Close", axis=1, level=0)
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+        close.index = pd.to_datetime(close.index).tz_localize(None)
+        return close.dropna(how="all")
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Precios sintéticos determinísticos por (ticker, fecha): pedir rangos
+    solapados da los mismos valores, así se prueba la caché sin red.
+    Registra cada llamada en `calls`.
+    """
+
+    name = "synthetic"
+    ANCHOR = pd.Timestamp("2000-01-01")
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, tickers, start, end, interval):
+        self.calls.append((tuple(tickers), pd.Timestamp(start), pd.Timestamp(end), interval))
+        freq = INTERVAL_FREQ[interval]
+        steps = INTERVAL_STEPS_PER_MONTH[interval]
+        index = pd.date_range(self.ANCHOR, pd.Timestamp(end) + pd.Timedelta(days=1), freq=freq,
+                              inclusive="left")
+        columns = {}
+        for ticker in tickers:
+            rng = np.random.default_rng(zlib.crc32(f"{ticker}|{interval}".encode()))
+            log_returns = 0.008 / steps + rng.normal(0, 0.04 / np.sqrt(steps), len(index))
+            columns[ticker] = 100 * np.exp(np.cumsum(log_returns))
+        return pd.DataFrame(columns, index=index).loc[pd.Timestamp(start):]
+
+
+def _ticker_meta(bars: pd.Series, provider: str, fetched_at: str, info: Optional[dict] = None) -> dict:
+    """
+    Metadata de un ticker tras recibir `bars`. La barra de control es la
+    anteúltima (ya cerrada; la última puede estar incompleta): el próximo
+    refresco empieza en ella y compara su valor con el guardado.
+    """
+    first, rows = bars.index[0], len(bars)
+    if info:
+        first = min(first, pd.Timestamp(info["first"]))
+        rows = info["rows"] + int((bars.index > pd.Timestamp(info["last"])).sum())
+    check = bars.index[-2] if len(bars) > 1 else bars.index[-1]
+    return {
+        "first":       str(first),
+        "last":        str(bars.index[-1]),
+        "rows":        int(rows),
+        "check_date":  str(check),
+        "check_close": float(bars[check]),
+        "provider":    provider,
+        "fetched_at":  fetched_at,
+    }
+
+
+def refresh_prices(tickers: list, interval: str, provider: PriceProvider,
+                   history_days: Optional[int] = None, max_age_hours: Optional[float] = None,
+                   store_dir: str = STORE_DIR, today: Optional[datetime.date] = None) -> dict:
+    """
+    Actualiza el almacén del intervalo descargando, por ticker, sólo desde
+    su barra de control (la anteúltima guardada) hasta hoy; los tickers
+    nuevos traen history_days de historia. Con max_age_hours, los tickers
+    descargados hace menos de ese tiempo no se piden.
+    Si la barra de control difiere de la guardada en más de
+    REBASE_TOLERANCE (el proveedor re-ajustó la historia por un split o
+    dividendo), se re-descarga la historia completa de ese ticker y se
+    reescribe el almacén; si no, sólo las barras nuevas se escriben como
+    una parte.
+    Retorna {"fetched": {ticker: filas}, "rebased": [...], "skipped": [...], "requests": n}.
+    """
+    today = today or datetime.date.today()
+    history_days = history_days or INTERVAL_MAX_DAYS[interval]
+    meta = read_meta(interval, store_dir)
+    now = datetime.datetime.now()
+    fetched_at = now.isoformat(timespec="seconds")
+
+    # Agrupar tickers por fecha de inicio: una descarga por grupo
+    groups, skipped = {}, []
+    for ticker in tickers:
+        info = meta.get(ticker)
+        if info and max_age_hours is not None:
+            age = (now - datetime.datetime.fromisoformat(info["fetched_at"])).total_seconds() / 3600
+            if age < max_age_hours:
+                skipped.append(ticker)
+                continue
+        start = (pd.Timestamp(info.get("check_date", info["last"])).date() if info
+                 else today - datetime.timedelta(days=history_days))
+        groups.setdefault(start, []).append(ticker)
+
+    new_parts, fetched, rebased = [], {}, []
+    requests = len(groups)
+    for start, group in groups.items():
+        delta = provider.fetch(group, start, today, interval)
+        delta = delta.loc[:, [t for t in group if t in delta.columns]].dropna(how="all")
+        if delta.empty:
+            continue
+
+        rebase = []
+        for ticker in delta.columns:
+            info = meta.get(ticker)
+            if not info or "check_date" not in info:
+                continue
+            value = delta[ticker].get(pd.Timestamp(info["check_date"]))
+            if value is not None and not np.isnan(value) and \
+                    abs(value / info["check_close"] - 1) > REBASE_TOLERANCE:
+                rebase.append(ticker)
+        if rebase:
+            # Historia re-ajustada: traer todo el rango de nuevo para esos tickers
+            first = min(min(pd.Timestamp(meta[t]["first"]) for t in rebase).date(),
+                        today - datetime.timedelta(days=history_days))
+            full = provider.fetch(rebase, first, today, interval)
+            requests += 1
+            for ticker in rebase:
+                bars = full[ticker].dropna()
+                meta[ticker] = _ticker_meta(bars, provider.name, fetched_at)
+                fetched[ticker] = len(bars)
+            rebased.append(full[rebase])
+            delta = delta.drop(columns=rebase)
+
+        new_parts.append(delta)
+        for ticker in delta.columns:
+            bars = delta[ticker].dropna()
+            if bars.empty:
+                continue
+            meta[ticker] = _ticker_meta(bars, provider.name, fetched_at, meta.get(ticker))
+            fetched[ticker] = len(bars)
+
+    new_parts = [part for part in new_parts if len(part.columns)]
+    if new_parts:
+        delta = pd.concat(new_parts, axis=1)
+        delta = delta.groupby(level=0).last() if delta.index.has_duplicates else delta
+        append_prices(delta, interval, store_dir)
+    if rebased:
+        full = pd.concat(rebased, axis=1)
+        stored = read_prices(interval, store_dir=store_dir)
+        columns = list(dict.fromkeys(list(stored.columns) + list(full.columns)))
+        stored = stored.drop(columns=[c for c in full.columns if c in stored.columns])
+        write_prices(pd.concat([stored, full], axis=1)[columns], interval, store_dir)
+    if new_parts or rebased:
+        _write_meta(meta, interval, store_dir)
+    return {"fetched": fetched, "rebased": list(full.columns) if rebased else [],
+            "skipped": skipped, "requests": requests}
+
+
+# ─────────────────────────────────────────────────────────────
+# REMUESTREO Y FRECUENCIA
+# ─────────────────────────────────────────────────────────────
+def resample_prices(prices: pd.DataFrame, rule: str = "MS") -> pd.DataFrame:
+    """
+    Último cierre de cada período (etiquetado al inicio, como el índice
+    mensual del pipeline), en una sola pasada vectorizada por columna.
+    Los períodos sin ninguna barra se descartan.
+    """
+    if prices.empty:
+        return prices
+    return prices.resample(rule).last().dropna(how="all")
+
+
+def infer_freq(index: pd.DatetimeIndex):
+    """
+    Frecuencia de un índice de fechas: la declarada o inferida por pandas;
+    días hábiles con feriados → "B"; en otro caso el paso mediano.
+    """
+    freq = index.freq or (pd.infer_freq(index) if len(index) >= 3 else None)
+    if freq is not None:
+        return pd.tseries.frequencies.to_offset(freq)
+    step = pd.Series(index).diff().median()
+    if pd.Timedelta(days=28) <= step <= pd.Timedelta(days=31):
+        return pd.offsets.MonthBegin()
+    if step == pd.Timedelta(days=1) and (index.dayofweek < 5).all():
+        return pd.offsets.BDay()
+    return pd.tseries.frequencies.to_offset(step)
@@ -0,0 +1,282 @@
+# risk.py — API de riesgo del portfolio: paramétrico + simulado
+"""
+Riesgo del portfolio bajo el modelo normal multivariado de run_monte_carlo,
+con la misma covarianza (monte_carlo.MC_VOLATILITY, ver simulation_inputs):
+  1. VaR/CVaR paramétricos en forma cerrada a partir de mu, cov y weights
+     (microsegundos, sin simular)
+  2. VaR/CVaR simulados con el motor de monte_carlo.py
+  3. portfolio_risk: devuelve ambos; con background=True la simulación
+     corre en un hilo y se entrega como Future
+  4. Barrido de pesos / frontera eficiente: evalúa miles de portfolios
+     sobre un mismo set de escenarios (escenarios × activos) @ (activos × portfolios)
+  5. Escenarios de estrés: transformaciones de (mu, cov) evaluadas en
+     paralelo sobre los mismos shocks N(0, 1) (números aleatorios comunes)
+
+Convención: VaR y CVaR son retornos (p.ej. -0.188 = pérdida de 18.8%),
+igual que las métricas de run_monte_carlo.
+"""
+
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+from monte_carlo import (
+    MC_VOLATILITY, covariance_factor, resolve_workers, risk_metrics, simulate_portfolio_paths,
+    simulation_inputs, standard_normal_draws,
+)
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="risk")
+
+
+# ─────────────────────────────────────────────────────────────
+# PARAMÉTRICO
+# ─────────────────────────────────────────────────────────────
+def parametric_risk(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                    confidence: float = 0.95, horizon: int = 1) -> dict:
+    """
+    VaR/CVaR normales del retorno del portfolio.
+    Un período: r_p ~ N(w·mu, w'Σw). Para horizon > 1 se agrega la suma
+    de retornos (media · h, varianza · h), sin capitalización. Con cov de
+    forma (meses × activos × activos) la varianza suma w'Σ_h w de los
+    primeros `horizon` meses.
+    """
+    weights = np.asarray(weights, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    mean = horizon * float(weights @ np.asarray(mu, dtype=float))
+    step_var = np.einsum("i,...ij,j->...", weights, cov, weights)
+    variance = float(step_var[:horizon].sum()) if cov.ndim == 3 else horizon * float(step_var)
+    sigma = math.sqrt(max(variance, 0.0))
+
+    z = NormalDist().inv_cdf(1 - confidence)
+    tail = 1 - confidence
+    return {
+        "method":     "parametric",
+        "confidence": confidence,
+        "horizon":    horizon,
+        "mean":       round(mean, 6),
+        "volatility": round(sigma, 6),
+        "var":        round(mean + z * sigma, 6),
+        "cvar":       round(mean - sigma * NormalDist().pdf(z) / tail, 6),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# SIMULADO
+# ─────────────────────────────────────────────────────────────
+def simulated_risk(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray,
+                   confidence: float = 0.95, horizon: int = 1,
+                   n_simulations: int = 100_000, seed: int = 42) -> dict:
+    """VaR/CVaR del retorno acumulado a `horizon` meses simulado con el motor vectorizado."""
+    rng = np.random.default_rng(seed)
+    cov = np.asarray(cov, dtype=float)
+    paths = simulate_portfolio_paths(mu, cov[:horizon] if cov.ndim == 3 else cov,
+                                     weights, n_simulations, horizon, rng)
+    returns = paths[:, -1] - 1
+
+    var = float(np.percentile(returns, (1 - confidence) * 100))
+    return {
+        "method":        "simulated",
+        "confidence":    confidence,
+        "horizon":       horizon,
+        "mean":          round(float(returns.mean()), 6),
+        "volatility":    round(float(returns.std(ddof=1)), 6),
+        "var":           round(var, 6),
+        "cvar":          round(float(returns[returns <= var].mean()), 6),
+        "n_simulations": n_simulations,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# API
+# ─────────────────────────────────────────────────────────────
+def portfolio_risk(prices, weights: Optional[np.ndarray] = None, confidence: float = 0.95,
+                   horizon: int = 1, n_simulations: int = 100_000, seed: int = 42,
+                   background: bool = False, volatility: str = MC_VOLATILITY) -> dict:
+    """
+    Estimaciones paramétrica y simulada del riesgo del portfolio.
+    weights=None → portfolio igualitario. volatility: modelo de covarianza
+    de monte_carlo.simulation_inputs (por defecto el del pipeline).
+    Con background=True retorna al instante: `parametric` ya calculado y
+    `simulated` como concurrent.futures.Future que se resuelve al terminar
+    la simulación.
+    """
+    mu, cov, equal_weights, _ = simulation_inputs(prices, horizon, volatility)
+    weights = equal_weights if weights is None else np.asarray(weights, dtype=float)
+
+    parametric = parametric_risk(mu, cov, weights, confidence, horizon)
+    args = (mu, cov, weights, confidence, horizon, n_simulations, seed)
+    if background:
+        pending: Future = _EXECUTOR.submit(simulated_risk, *args)
+        return {"parametric": parametric, "simulated": pending}
+
+    return {"parametric": parametric, "simulated": simulated_risk(*args)}
+
+
+# ─────────────────────────────────────────────────────────────
+# BARRIDO DE PESOS / FRONTERA EFICIENTE
+# ─────────────────────────────────────────────────────────────
+def simulate_asset_scenarios(mu: np.ndarray, cov: np.ndarray, n_scenarios: int = 5000,
+                             n_months: int = 12, seed: int = 42) -> np.ndarray:
+    """
+    Retornos acumulados por activo a n_months (escenarios × activos),
+    con los mismos shocks correlacionados que run_monte_carlo (cov puede
+    ser una trayectoria meses × activos × activos).
+    """
+    mu = np.asarray(mu, dtype=float)
+    rng = np.random.default_rng(seed)
+    shocks = standard_normal_draws(n_scenarios, n_months, len(mu), rng)
+    factor = covariance_factor(cov)
+    if factor.ndim == 2:
+        asset_returns = mu + shocks @ factor.T
+    else:
+        asset_returns = mu + np.einsum("nmj,mij->nmi", shocks, factor)
+    return np.prod(1 + asset_returns, axis=1) - 1
+
+
+def random_weights(n_assets: int, n_portfolios: int = 2000, seed: int = 42) -> np.ndarray:
+    """Pesos long-only uniformes en el simplex (Dirichlet(1)), matriz (portfolios × activos)."""
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(n_assets), size=n_portfolios)
+
+
+def evaluate_portfolios(scenarios: np.ndarray, weights: np.ndarray,
+                        confidence: float = 0.95, batch_size: int = 1024) -> dict:
+    """
+    Retorno esperado, volatilidad, VaR y CVaR de cada portfolio.
+    scenarios: (escenarios × activos) retornos a horizonte (buy & hold)
+    weights:   (portfolios × activos)
+    Un solo producto matricial por lote de portfolios; no se re-simula.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    n_scenarios = len(scenarios)
+    n_tail = max(1, math.ceil(n_scenarios * (1 - confidence)))
+    out = {k: np.empty(len(weights)) for k in ("expected_return", "volatility", "var", "cvar")}
+
+    for start in range(0, len(weights), batch_size):
+        block = slice(start, start + batch_size)
+        returns = scenarios @ weights[block].T                 # (escenarios × portfolios)
+        tail = np.partition(returns, n_tail - 1, axis=0)[:n_tail]
+        out["expected_return"][block] = returns.mean(axis=0)
+        out["volatility"][block] = returns.std(axis=0, ddof=1)
+        out["var"][block] = tail.max(axis=0)
+        out["cvar"][block] = tail.mean(axis=0)
+    return out
+
+
+def frontier_mask(risk_values: np.ndarray, expected_returns: np.ndarray) -> np.ndarray:
+    """Portfolios no dominados: ninguno con menos riesgo tiene más retorno."""
+    order = np.argsort(risk_values, kind="stable")
+    best = np.maximum.accumulate(expected_returns[order])
+    on_front = np.empty(len(order), dtype=bool)
+    on_front[order] = expected_returns[order] >= best
+    return on_front
+
+
+def portfolio_frontier(prices, n_portfolios: int = 2000, n_scenarios: int = 5000,
+                       n_months: int = 12, confidence: float = 0.95,
+                       risk_measure: str = "volatility", seed: int = 42,
+                       volatility: str = MC_VOLATILITY):
+    """
+    Barrido de pesos aleatorios + portfolio igualitario sobre escenarios comunes
+    simulados con el modelo de covarianza `volatility` (el del pipeline).
+    Retorna DataFrame con una fila por portfolio: pesos por ticker,
+    expected_return, volatility, var, cvar y on_frontier (según risk_measure;
+    para var/cvar el riesgo es la pérdida, -var / -cvar).
+    """
+    import pandas as pd
+
+    mu, cov, equal_weights, _ = simulation_inputs(prices, n_months, volatility)
+    scenarios = simulate_asset_scenarios(mu, cov, n_scenarios, n_months, seed)
+    weights = np.vstack([equal_weights, random_weights(len(mu), n_portfolios, seed)])
+
+    scores = evaluate_portfolios(scenarios, weights, confidence)
+    risk_values = scores[risk_measure] if risk_measure == "volatility" else -scores[risk_measure]
+
+    df = pd.DataFrame(weights, columns=list(prices.columns))
+    for key, values in scores.items():
+        df[key] = values
+    df["on_frontier"] = frontier_mask(risk_values, scores["expected_return"])
+    df["equal_weight"] = np.arange(len(df)) == 0
+    return df
+
+
+# ─────────────────────────────────────────────────────────────
+# ESCENARIOS DE ESTRÉS
+# ─────────────────────────────────────────────────────────────
+# Cada transformación recibe mu (Series) y cov (DataFrame) indexados por
+# ticker y retorna el par (mu, cov) del escenario.
+def correlation_to_one(mu, cov):
+    """Correlación perfecta entre activos, manteniendo las volatilidades."""
+    vol = np.sqrt(np.diag(cov.values))
+    perfect = cov.copy()
+    perfect.loc[:, :] = np.outer(vol, vol)
+    return mu, perfect
+
+
+def scale_volatility(factor: float):
+    """Multiplica todas las volatilidades por `factor`."""
+    return lambda mu, cov: (mu, cov * factor ** 2)
+
+
+def shock_drift(deltas: dict):
+    """Suma `deltas[ticker]` al retorno mensual medio de cada ticker indicado."""
+    def transform(mu, cov):
+        return mu.add(mu.index.to_series().map(deltas).fillna(0.0)), cov
+    return transform
+
+
+DEFAULT_SCENARIOS = [
+    ("correlation_1",  correlation_to_one),
+    ("volatility_x2",  scale_volatility(2.0)),
+    ("volatility_x1.5", scale_volatility(1.5)),
+    ("drift_-1pct",    lambda mu, cov: (mu - 0.01, cov)),
+    ("drift_zero",     lambda mu, cov: (mu * 0.0, cov)),
+    ("crisis",         lambda mu, cov: correlation_to_one(mu - 0.02, cov * 4.0)),
+]
+
+
+def stress_test(mu, cov, weights: np.ndarray, scenarios: list,
+                n_simulations: int = 5000, n_months: int = 12,
+                seed: int = 42, n_workers: int = -1):
+    """
+    Evalúa el escenario base y cada (nombre, transformación) sobre un único
+    tensor de shocks N(0, 1) compartido (números aleatorios comunes): las
+    diferencias entre escenarios no llevan ruido de muestreo.
+    cov: DataFrame (activos × activos) o trayectoria (n_months × activos ×
+    activos) de monte_carlo.simulation_inputs; en ese caso cada
+    transformación se aplica mes a mes (como DataFrame indexado por ticker).
+    Los escenarios corren en hilos que leen el mismo tensor sin copiarlo.
+    Retorna DataFrame con una fila por escenario.
+    """
+    import pandas as pd
+
+    weights = np.asarray(weights, dtype=float)
+    rng = np.random.default_rng(seed)
+    shocks = standard_normal_draws(n_simulations, n_months, len(mu), rng)
+
+    def apply(transform):
+        if np.ndim(cov) < 3:
+            return transform(mu, cov)
+        months = [transform(mu, pd.DataFrame(c, index=mu.index, columns=mu.index)) for c in cov]
+        return months[0][0], np.stack([np.asarray(c, dtype=float) for _, c in months])
+
+    def evaluate(item):
+        name, transform = item
+        s_mu, s_cov = apply(transform)
+        loadings = np.einsum("...ij,i->...j", covariance_factor(np.asarray(s_cov, dtype=float)), weights)
+        shock_returns = shocks @ loadings if loadings.ndim == 1 else np.einsum("nmj,mj->nm", shocks, loadings)
+        portfolio_returns = weights @ np.asarray(s_mu, dtype=float) + shock_returns
+        finals = np.cumprod(1 + portfolio_returns, axis=1)[:, -1]
+        return {"scenario": name, **risk_metrics(finals)}
+
+    items = [("baseline", lambda m, c: (m, c))] + list(scenarios)
+    with ThreadPoolExecutor(max_workers=resolve_workers(n_workers)) as pool:
+        rows = list(pool.map(evaluate, items))
+
+    df = pd.DataFrame(rows)
+    for col in ("var_95", "cvar", "base_case"):
+        df[f"delta_{col}"] = (df[col] - df.loc[0, col]).round(4)
+    return df
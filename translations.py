@@ -20,6 +20,12 @@ TEXTS = {
         "filter_dept":        "Departamento",
         "filter_level":       "Nivel Jerárquico",
         "filter_sims":        "Simulaciones Monte Carlo",
+        "mc_mapped_help":     "En {pos:,} se usa la corrida del pipeline ({n:,} simulaciones); otros valores simulan bajo demanda.",
+        "mc_model_caption":   "Covarianza: {model} — el mismo modelo en la corrida del pipeline, el motor bajo demanda y la frontera.",
+        "mc_model_garch":     "GARCH(1,1) con correlación constante",
+        "mc_model_ewma":      "EWMA (λ = 0.94) con correlación constante",
+        "mc_model_static":    "histórica constante",
+        "mc_engine_error":    "No se pudo simular {n:,} escenarios ({err}); se usan los resultados guardados, si existen.",
         "download_btn":       "Descargar CSV",
         "developed_by":       "Desarrollado por Hely Camargo · Python · Statsmodels · Scikit-learn · Plotly · Streamlit",
         "insight_label":      "Insight de Negocio",
@@ -71,6 +77,15 @@ TEXTS = {
         "correlation_matrix": "Matriz de Correlación entre Activos",
         "mc_distribution":    "Distribución Monte Carlo — Resultados del Portfolio",
         "mc_fan_chart":       "Fan Chart — Escenarios de Portfolio (12 Meses)",
+        "mc_trajectories":    "Trayectorias simuladas",
+        "efficient_frontier": "Frontera Eficiente — Barrido de Pesos del Portfolio",
+        "frontier_risk":      "Medida de riesgo",
+        "frontier_risk_volatility": "Volatilidad",
+        "frontier_risk_cvar": "CVaR 95%",
+        "frontier_points":    "Portfolios simulados",
+        "frontier_line":      "Frontera eficiente",
+        "equal_weight":       "Portfolio igualitario",
+        "expected_return":    "Retorno esperado 12M (%)",
         "risk_summary_title": "Resumen Ejecutivo de Riesgo",
         "risk_var_text":      "Con 95% de confianza, la pérdida máxima en 12 meses no superará",
         "risk_cvar_text":     "En el peor 5% de escenarios, pérdida esperada promedio:",
@@ -98,6 +113,12 @@ TEXTS = {
         "filter_dept":        "Department",
         "filter_level":       "Job Level",
         "filter_sims":        "Monte Carlo Simulations",
+        "mc_mapped_help":     "At {pos:,} the pipeline run ({n:,} simulations) is used; other values simulate on demand.",
+        "mc_model_caption":   "Covariance: {model} — the same model in the pipeline run, the on-demand engine and the frontier.",
+        "mc_model_garch":     "GARCH(1,1) with constant correlation",
+        "mc_model_ewma":      "EWMA (λ = 0.94) with constant correlation",
+        "mc_model_static":    "constant historical",
+        "mc_engine_error":    "Could not simulate {n:,} scenarios ({err}); using the saved results, if any.",
         "download_btn":       "Download CSV",
         "developed_by":       "Developed by Hely Camargo · Python · Statsmodels · Scikit-learn · Plotly · Streamlit",
         "insight_label":      "Business Insight",
@@ -149,6 +170,15 @@ TEXTS = {
         "correlation_matrix": "Asset Correlation Matrix",
         "mc_distribution":    "Monte Carlo Distribution — Portfolio Outcomes",
         "mc_fan_chart":       "Fan Chart — Portfolio Scenarios (12 Months)",
+        "mc_trajectories":    "Simulated paths",
+        "efficient_frontier": "Efficient Frontier — Portfolio Weight Sweep",
+        "frontier_risk":      "Risk measure",
+        "frontier_risk_volatility": "Volatility",
+        "frontier_risk_cvar": "CVaR 95%",
+        "frontier_points":    "Simulated portfolios",
+        "frontier_line":      "Efficient frontier",
+        "equal_weight":       "Equal-weight portfolio",
+        "expected_return":    "Expected 12M return (%)",
         "risk_summary_title": "Executive Risk Summary",
         "risk_var_text":      "With 95% confidence, maximum 12-month loss will not exceed",
         "risk_cvar_text":     "In the worst 5% of scenarios, expected average loss:",
@@ -176,6 +206,12 @@ TEXTS = {
         "filter_dept":        "Departamento",
         "filter_level":       "Nível Hierárquico",
         "filter_sims":        "Simulações Monte Carlo",
+        "mc_mapped_help":     "Em {pos:,} usa-se a execução do pipeline ({n:,} simulações); outros valores simulam sob demanda.",
+        "mc_model_caption":   "Covariância: {model} — o mesmo modelo na execução do pipeline, no motor sob demanda e na fronteira.",
+        "mc_model_garch":     "GARCH(1,1) com correlação constante",
+        "mc_model_ewma":      "EWMA (λ = 0.94) com correlação constante",
+        "mc_model_static":    "histórica constante",
+        "mc_engine_error":    "Não foi possível simular {n:,} cenários ({err}); usando os resultados salvos, se existirem.",
         "download_btn":       "Baixar CSV",
         "developed_by":       "Desenvolvido por Hely Camargo · Python · Statsmodels · Scikit-learn · Plotly · Streamlit",
         "insight_label":      "Insight de Negócio",
@@ -227,6 +263,15 @@ TEXTS = {
         "correlation_matrix": "Matriz de Correlação entre Ativos",
         "mc_distribution":    "Distribuição Monte Carlo — Resultados do Portfólio",
         "mc_fan_chart":       "Fan Chart — Cenários do Portfólio (12 Meses)",
+        "mc_trajectories":    "Trajetórias simuladas",
+        "efficient_frontier": "Fronteira Eficiente — Varredura de Pesos do Portfólio",
+        "frontier_risk":      "Medida de risco",
+        "frontier_risk_volatility": "Volatilidade",
+        "frontier_risk_cvar": "CVaR 95%",
+        "frontier_points":    "Portfólios simulados",
+        "frontier_line":      "Fronteira eficiente",
+        "equal_weight":       "Portfólio igualitário",
+        "expected_return":    "Retorno esperado 12M (%)",
         "risk_summary_title": "Resumo Executivo de Risco",
         "risk_var_text":      "Com 95% de confiança, a perda máxima em 12 meses não superará",
         "risk_cvar_text":     "Nos piores 5% dos cenários, perda esperada média:",
@@ -0,0 +1,189 @@
+# volatility.py — Volatilidad condicional en lote (EWMA / GARCH(1,1))
+"""
+Modelos de volatilidad para todos los tickers a la vez:
+  1. EWMA (RiskMetrics, λ = 0.94)
+  2. GARCH(1,1) con variance targeting: ω = σ̄²(1 - α - β), con σ̄² la
+     varianza muestral. Punto de partida por grilla (una sola recursión
+     sobre el tensor puntos de grilla × tickers) y máxima verosimilitud
+     gaussiana por ticker con L-BFGS-B; si el óptimo cae en una cota se
+     usa varianza constante para ese ticker
+  3. Pronóstico de la varianza h pasos adelante y covarianza CCC
+     (correlación constante de los residuos estandarizados):
+     Σ_h = D_h R D_h, tensor (meses × activos × activos) que consume
+     monte_carlo.simulate_portfolio_paths
+
+Usado por financial_pipeline.run_monte_carlo(volatility=...).
+"""
+
+import numpy as np
+
+EWMA_LAMBDA = 0.94
+VOLATILITY_MODELS = ("static", "ewma", "garch")
+
+
+# ─────────────────────────────────────────────────────────────
+# EWMA
+# ─────────────────────────────────────────────────────────────
+def ewma_variance(eps: np.ndarray, lam: float = EWMA_LAMBDA) -> np.ndarray:
+    """
+    Varianza condicional EWMA (T+1 × tickers): la fila t usa la
+    información hasta t-1 y la última es el pronóstico del próximo período.
+    Arranca en la varianza muestral.
+    """
+    eps = np.asarray(eps, dtype=float)
+    sigma2 = np.empty((len(eps) + 1, eps.shape[1]))
+    sigma2[0] = eps.var(axis=0)
+    for t, e in enumerate(eps):
+        sigma2[t + 1] = lam * sigma2[t] + (1 - lam) * e ** 2
+    return sigma2
+
+
+# ─────────────────────────────────────────────────────────────
+# GARCH(1,1)
+# ─────────────────────────────────────────────────────────────
+def _garch_loglik(eps: np.ndarray, var_target: np.ndarray,
+                  alpha: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """
+    Log-verosimilitud gaussiana (sin constante) para cada (α, β) de las
+    matrices alpha/beta (puntos × tickers), en una sola recursión sobre t.
+    Puntos no estacionarios (α + β >= 1) → -inf.
+    """
+    omega = var_target * (1 - alpha - beta)
+    sigma2 = np.broadcast_to(var_target, alpha.shape).copy()
+    ll = np.zeros(alpha.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):     # σ² < 0 en puntos no estacionarios
+        for e2 in eps ** 2:
+            ll -= np.log(sigma2) + e2 / sigma2
+            sigma2 = omega + alpha * e2 + beta * sigma2
+    ll *= 0.5
+    ll[(alpha + beta >= 0.999) | (alpha <= 0) | (beta < 0)] = -np.inf
+    return ll
+
+
+def garch_variance(eps: np.ndarray, var_target: np.ndarray,
+                   alpha: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """Varianza condicional (T+1 × tickers) con parámetros por ticker; última fila = pronóstico."""
+    omega = var_target * (1 - alpha - beta)
+    sigma2 = np.empty((len(eps) + 1, eps.shape[1]))
+    sigma2[0] = var_target
+    for t, e in enumerate(eps):
+        sigma2[t + 1] = omega + alpha * e ** 2 + beta * sigma2[t]
+    return sigma2
+
+
+# Cotas del optimizador y tolerancia para considerar que el óptimo quedó en el borde
+GARCH_ALPHA_BOUNDS = (1e-6, 0.5)
+GARCH_BETA_BOUNDS = (0.0, 0.99)
+GARCH_MAX_PERSISTENCE = 0.99
+GARCH_BOUND_TOL = 1e-3
+
+
+def _garch_mle(eps: np.ndarray, var_target: float, start: tuple) -> tuple:
+    """
+    Máxima verosimilitud de (α, β) de un ticker con L-BFGS-B desde `start`
+    (mejor punto de la grilla). Los puntos no estacionarios se penalizan.
+    Retorna (alpha, beta, loglik sin constante).
+    """
+    from scipy.optimize import minimize
+
+    col = eps[:, None]
+
+    def nll(x):
+        if x[0] + x[1] >= GARCH_MAX_PERSISTENCE:
+            return 1e10
+        return -float(_garch_loglik(col, var_target, np.array([[x[0]]]), np.array([[x[1]]]))[0, 0])
+
+    res = minimize(nll, np.asarray(start, dtype=float), method="L-BFGS-B",
+                   bounds=[GARCH_ALPHA_BOUNDS, GARCH_BETA_BOUNDS])
+    alpha, beta = res.x if res.fun < nll(start) else start
+    return float(alpha), float(beta), -min(res.fun, nll(start))
+
+
+def fit_garch(returns: np.ndarray, n_alpha: int = 10, n_beta: int = 12) -> dict:
+    """
+    GARCH(1,1) con variance targeting para cada columna de `returns`
+    (tiempo × tickers). Grilla gruesa α ∈ [0.01, 0.30], β ∈ [0, 0.98]
+    evaluada para todos los tickers a la vez como punto de partida y
+    máxima verosimilitud por ticker con L-BFGS-B (α ∈ GARCH_ALPHA_BOUNDS,
+    β ∈ GARCH_BETA_BOUNDS, α + β < GARCH_MAX_PERSISTENCE).
+    Si el óptimo queda en una cota (α ≈ 0, β ≈ 0, α o β en su máximo o
+    persistencia en el límite) el ticker no tiene un GARCH identificable
+    con estos datos: se usa varianza constante (α = β = 0, σ² = σ̄²) y
+    `boundary` lo marca.
+    Retorna alpha, beta, omega, var_target, persistence, sigma2 (T+1 × tickers),
+    loglik y boundary por ticker.
+    """
+    returns = np.asarray(returns, dtype=float)
+    eps = returns - returns.mean(axis=0)
+    var_target = eps.var(axis=0)
+    k = eps.shape[1]
+
+    alphas = np.linspace(0.01, 0.30, n_alpha)
+    betas = np.linspace(0.0, 0.98, n_beta)
+    a, b = (g.ravel()[:, None] * np.ones(k) for g in np.meshgrid(alphas, betas))
+    ll = _garch_loglik(eps, var_target, a, b)
+    best = ll.argmax(axis=0)
+    cols = np.arange(k)
+
+    alpha, beta, loglik = np.empty(k), np.empty(k), np.empty(k)
+    for j in cols:
+        alpha[j], beta[j], loglik[j] = _garch_mle(eps[:, j], var_target[j], (a[best[j], j], b[best[j], j]))
+
+    tol = GARCH_BOUND_TOL
+    boundary = ((alpha <= GARCH_ALPHA_BOUNDS[0] + tol) | (alpha >= GARCH_ALPHA_BOUNDS[1] - tol)
+                | (beta <= GARCH_BETA_BOUNDS[0] + tol) | (beta >= GARCH_BETA_BOUNDS[1] - tol)
+                | (alpha + beta >= GARCH_MAX_PERSISTENCE - tol))
+    alpha[boundary], beta[boundary] = 0.0, 0.0
+    # Varianza constante: log-verosimilitud con σ² = σ̄² en todo t
+    loglik[boundary] = -0.5 * (len(eps) * np.log(var_target) + (eps ** 2).sum(axis=0) / var_target)[boundary]
+
+    n = len(eps)
+    return {
+        "alpha":       alpha,
+        "beta":        beta,
+        "omega":       var_target * (1 - alpha - beta),
+        "var_target":  var_target,
+        "persistence": alpha + beta,
+        "sigma2":      garch_variance(eps, var_target, alpha, beta),
+        "loglik":      loglik - 0.5 * n * np.log(2 * np.pi),
+        "boundary":    boundary,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# PRONÓSTICO Y COVARIANZA CCC
+# ─────────────────────────────────────────────────────────────
+def variance_path(fit: dict, n_steps: int) -> np.ndarray:
+    """
+    Varianza esperada de los próximos n_steps períodos (pasos × tickers):
+    σ̄² + (α + β)^h (σ²_{T+1} - σ̄²), h = 0 .. n_steps-1.
+    """
+    h = np.arange(n_steps)[:, None]
+    next_var = fit["sigma2"][-1]
+    return fit["var_target"] + fit["persistence"] ** h * (next_var - fit["var_target"])
+
+
+def covariance_path(returns: np.ndarray, n_steps: int, model: str = "garch") -> tuple:
+    """
+    Covarianza condicional de los próximos n_steps períodos
+    (pasos × activos × activos) con correlación constante (CCC) estimada
+    sobre los residuos estandarizados. model: "garch" o "ewma" (varianza
+    plana en el último valor EWMA).
+    Retorna (cov_path, fit).
+    """
+    returns = np.asarray(returns, dtype=float)
+    eps = returns - returns.mean(axis=0)
+    if model == "garch":
+        fit = fit_garch(returns)
+        path = variance_path(fit, n_steps)
+    elif model == "ewma":
+        sigma2 = ewma_variance(eps)
+        fit = {"sigma2": sigma2, "var_target": eps.var(axis=0), "lambda": EWMA_LAMBDA}
+        path = np.repeat(sigma2[-1:], n_steps, axis=0)
+    else:
+        raise ValueError(f"model debe ser 'garch' o 'ewma', no {model!r}")
+
+    std_resid = eps / np.sqrt(fit["sigma2"][:-1])
+    corr = np.atleast_2d(np.corrcoef(std_resid, rowvar=False))
+    vol = np.sqrt(path)
+    return corr[None] * vol[:, :, None] * vol[:, None, :], fit
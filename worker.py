@@ -0,0 +1,308 @@
+# worker.py — Worker residente del pipeline financiero
+"""
+Proceso de larga vida que mantiene cargados pandas/scipy/statsmodels/
+pmdarima y los modelos ARIMA ajustados, y atiende trabajos por un socket
+local (multiprocessing.connection, con authkey; ver resolve_authkey):
+  - "forecast": run_arima_forecast con la caché de modelos residente
+  - "simulate": run_monte_carlo
+  - "stats" / "ping" / "shutdown"
+
+Uso:
+  python worker.py                      # arranca el worker (bloquea)
+  WorkerClient().forecast(prices)       # desde otro proceso
+  benchmark_worker(prices)              # latencia en frío vs en caliente
+
+Este módulo sólo importa la biblioteca estándar al cargarse: el cliente
+no paga el costo de importar el stack científico.
+"""
+
+import os
+import secrets
+import stat
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Optional
+
+ADDRESS = ("127.0.0.1", int(os.environ.get("FIN_WORKER_PORT", 6011)))
+# Clave compartida: FIN_WORKER_AUTHKEY, o un archivo 0600 generado por el worker
+AUTHKEY_FILE = os.environ.get("FIN_WORKER_AUTHKEY_FILE", os.path.join("output", ".worker_authkey"))
+
+# Módulos que el worker importa al arrancar (en este orden)
+WARM_MODULES = (
+    "numpy", "pandas", "scipy.stats", "statsmodels.tsa.stattools",
+    "pmdarima", "financial_pipeline", "monte_carlo", "forecasting",
+)
+
+
+def resolve_authkey(create: bool = False, path: str = AUTHKEY_FILE) -> bytes:
+    """
+    Clave del socket: FIN_WORKER_AUTHKEY si está definida; si no, el
+    contenido de `path` (debe tener permisos 0600). Con create=True (el
+    worker al arrancar) genera secrets.token_bytes(32) en `path` si no
+    existe. Sin variable ni archivo → RuntimeError: no hay clave por
+    defecto, porque la conexión intercambia objetos pickle.
+    """
+    env = os.environ.get("FIN_WORKER_AUTHKEY")
+    if env:
+        return env.encode()
+    if not os.path.exists(path):
+        if not create:
+            raise RuntimeError(f"Sin clave del worker: defina FIN_WORKER_AUTHKEY o arranque el worker "
+                               f"para generar {path}.")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return resolve_authkey(False, path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+    if os.name == "posix" and stat.S_IMODE(os.stat(path).st_mode) & 0o077:
+        raise RuntimeError(f"{path} es legible por otros usuarios: permisos requeridos 0600.")
+    with open(path, "rb") as f:
+        key = f.read()
+    if len(key) < 16:
+        raise RuntimeError(f"Clave del worker inválida en {path}.")
+    return key
+
+
+def timed_imports(modules=WARM_MODULES) -> dict:
+    """Importa cada módulo y retorna {módulo: segundos} (0 si ya estaba cargado)."""
+    import importlib
+
+    times = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            times[name] = None
+            continue
+        times[name] = round(time.perf_counter() - start, 4)
+    return times
+
+
+# ─────────────────────────────────────────────────────────────
+# SERVIDOR
+# ─────────────────────────────────────────────────────────────
+class FinancialWorker:
+    """Estado residente: módulos importados, caché ARIMA en memoria y contadores."""
+
+    def __init__(self, address=ADDRESS, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey or resolve_authkey(create=True)
+        self.started = time.time()
+        self.import_times = timed_imports()
+
+        from arima_cache import ArimaModelCache
+        from financial_pipeline import _log
+
+        self.cache = ArimaModelCache(keep_in_memory=True)
+        self.jobs = {}
+        self._log = _log
+        self._log(f"[OK] Worker: imports en {sum(v or 0 for v in self.import_times.values()):.2f}s "
+                  f"{self.import_times}")
+
+    def handle(self, job: dict):
+        op = job.get("op")
+        if op == "ping":
+            return "pong"
+        if op == "stats":
+            return {
+                "uptime": round(time.time() - self.started, 1),
+                "import_times": self.import_times,
+                "jobs": dict(self.jobs),
+                "cache": self.cache.stats(),
+            }
+        if op == "forecast":
+            from financial_pipeline import run_arima_forecast
+
+            return run_arima_forecast(job["prices"], cache=self.cache, **job.get("kwargs", {}))
+        if op == "simulate":
+            from financial_pipeline import run_monte_carlo
+
+            result = run_monte_carlo(job["prices"], **job.get("kwargs", {}))
+            # El PathStore vive en este proceso: se envía sólo lo serializable
+            return {k: v for k, v in result.items() if k not in ("path_store", "paths")}
+        raise ValueError(f"Operación desconocida: {op!r}")
+
+    def serve_forever(self) -> None:
+        with Listener(self.address, authkey=self.authkey) as listener:
+            self._log(f"[OK] Worker escuchando en {self.address[0]}:{self.address[1]}")
+            while True:
+                # Un cliente con otra authkey o que corta el handshake no detiene al worker
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    self._log(f"[WARN] Worker: conexión rechazada ({type(e).__name__}: {e})")
+                    continue
+                with conn:
+                    try:
+                        job = conn.recv()
+                    except (EOFError, OSError) as e:
+                        self._log(f"[WARN] Worker: conexión cerrada antes del trabajo ({type(e).__name__})")
+                        continue
+                    except Exception as e:          # payload que no se puede deserializar
+                        self._send(conn, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+                        continue
+                    if not isinstance(job, dict):
+                        self._send(conn, {"ok": False, "error": f"Trabajo inválido: se esperaba dict, no {type(job).__name__}"})
+                        continue
+                    if job.get("op") == "shutdown":
+                        self._send(conn, {"ok": True, "result": None})
+                        self._log("[OK] Worker detenido.")
+                        return
+
+                    start = time.perf_counter()
+                    try:
+                        reply = {"ok": True, "result": self.handle(job)}
+                    except Exception as e:
+                        reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                    elapsed = time.perf_counter() - start
+                    self.jobs[job.get("op")] = self.jobs.get(job.get("op"), 0) + 1
+                    reply["seconds"] = round(elapsed, 4)
+                    self._send(conn, reply)
+
+    def _send(self, conn, reply: dict) -> None:
+        """Responde al cliente; si ya se desconectó sólo se registra."""
+        try:
+            conn.send(reply)
+        except (EOFError, OSError) as e:
+            self._log(f"[WARN] Worker: no se pudo responder ({type(e).__name__})")
+        except Exception as e:                      # resultado no serializable
+            conn.send({"ok": False, "error": f"Respuesta no serializable: {type(e).__name__}: {e}"})
+
+
+# ─────────────────────────────────────────────────────────────
+# CLIENTE
+# ─────────────────────────────────────────────────────────────
+class WorkerClient:
+    """Una conexión por trabajo; los errores del worker se relanzan como RuntimeError."""
+
+    def __init__(self, address=ADDRESS, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey or resolve_authkey()
+
+    def call(self, op: str, **payload):
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send({"op": op, **payload})
+            reply = conn.recv()
+        if not reply["ok"]:
+            raise RuntimeError(f"Worker: {reply['error']}")
+        return reply["result"]
+
+    def forecast(self, prices, **kwargs):
+        return self.call("forecast", prices=prices, kwargs=kwargs)
+
+    def simulate(self, prices, **kwargs):
+        return self.call("simulate", prices=prices, kwargs=kwargs)
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+    def ping(self) -> bool:
+        try:
+            return self.call("ping") == "pong"
+        except (ConnectionError, OSError):
+            return False
+
+    def shutdown(self) -> None:
+        self.call("shutdown")
+
+
+def start_worker(address=ADDRESS, timeout: float = 120.0):
+    """
+    Lanza `python worker.py` en segundo plano (si no hay uno escuchando) y
+    espera a que responda. Retorna (cliente, proceso o None si ya existía).
+    """
+    import subprocess
+
+    # La clave se genera antes de lanzar el worker: cliente y worker leen el mismo archivo
+    client = WorkerClient(address, resolve_authkey(create=True))
+    if client.ping():
+        return client, None
+    env = dict(os.environ, FIN_WORKER_PORT=str(address[1]))
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env,
+                            cwd=os.getcwd(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.ping():
+            return client, proc
+        if proc.poll() is not None:
+            raise RuntimeError(f"El worker terminó al arrancar (código {proc.returncode}).")
+        time.sleep(0.2)
+    proc.terminate()
+    raise TimeoutError(f"El worker no respondió en {timeout}s.")
+
+
+# ─────────────────────────────────────────────────────────────
+# INSTRUMENTACIÓN
+# ─────────────────────────────────────────────────────────────
+_COLD_SCRIPT = """
+import pickle, sys, time
+t0 = time.perf_counter()
+from financial_pipeline import run_arima_forecast
+t1 = time.perf_counter()
+prices = pickle.load(open(sys.argv[1], "rb"))
+run_arima_forecast(prices, use_cache=True)
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def benchmark_worker(prices, repeats: int = 3, address=ADDRESS):
+    """
+    Latencia del forecast:
+      cold:  proceso nuevo (intérprete + imports + caché desde disco + forecast)
+      warm:  el mismo trabajo enviado al worker residente (primer envío y repeticiones)
+    Exporta output/worker_benchmark.csv.
+    """
+    import pickle
+    import subprocess
+    import tempfile
+
+    import pandas as pd
+
+    rows = []
+    with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as f:
+        pickle.dump(prices, f)
+    try:
+        for i in range(repeats):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", _COLD_SCRIPT, f.name], cwd=os.getcwd(),
+                                 env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))),
+                                 capture_output=True, text=True, check=True)
+            total = time.perf_counter() - start
+            import_s, job_s = map(float, out.stdout.strip().splitlines()[-1].split())
+            rows.append({"mode": "cold", "run": i, "total_seconds": round(total, 4),
+                         "import_seconds": round(import_s, 4), "job_seconds": round(job_s, 4)})
+    finally:
+        os.remove(f.name)
+
+    client, proc = start_worker(address)
+    try:
+        for i in range(repeats + 1):
+            start = time.perf_counter()
+            client.forecast(prices)
+            rows.append({"mode": "warm", "run": i, "total_seconds": round(time.perf_counter() - start, 4),
+                         "import_seconds": 0.0, "job_seconds": None})
+        stats = client.stats()
+    finally:
+        if proc is not None:
+            client.shutdown()
+            proc.wait(timeout=30)
+
+    from financial_pipeline import _log
+
+    df = pd.DataFrame(rows)
+    os.makedirs("output", exist_ok=True)
+    df.to_csv("output/worker_benchmark.csv", index=False)
+    _log(f"[QA] Worker: imports al arrancar {stats['import_times']}")
+    _log(f"[QA] Latencia forecast (s):\n{df.groupby('mode')['total_seconds'].agg(['mean', 'min', 'max'])}")
+    return df
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    FinancialWorker().serve_forever()